@@ -16,7 +16,15 @@ def get_db_client():
     """Returns the MongoDB client (singleton)"""
     global _client
     if _client is None:
-        _client = MongoClient(MONGODB_URL)
+        # Pooled and wire-compressed, shared by every router
+        _client = MongoClient(
+            MONGODB_URL,
+            maxPoolSize=50,
+            minPoolSize=5,
+            maxIdleTimeMS=300000,
+            compressors='zstd,zlib',
+            retryWrites=True
+        )
     return _client
 
 def get_database():
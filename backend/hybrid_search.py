@@ -7,11 +7,22 @@ Save this file as: backend/hybrid_search.py
 
 from pymongo import MongoClient
 import numpy as np
+from scipy.sparse import csc_matrix
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
-from rank_bm25 import BM25Okapi
 import re
-from typing import List, Dict, Tuple
+from collections import Counter
+from typing import List, Dict, Optional, Tuple
+
+try:
+    from numba import njit, prange
+except ImportError:  # numba is optional - fall back to the plain Python loop
+    prange = range
+
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
 
 # ============================================
 # CONFIGURATION
@@ -19,6 +30,58 @@ from typing import List, Dict, Tuple
 MONGO_URI = "mongodb://localhost:27017/"
 DATABASE_NAME = "vastr_fashion_db"
 
+# BM25 parameters (same defaults as rank_bm25.BM25Okapi)
+BM25_K1 = 1.5
+BM25_B = 0.75
+BM25_EPSILON = 0.25
+
+
+# ============================================
+# BM25 SCORING KERNEL
+# ============================================
+def _aligned_copy(arr: np.ndarray, alignment: int = 32) -> np.ndarray:
+    """Copy a 1-D array into a contiguous buffer starting on an alignment-byte boundary"""
+    nbytes = arr.size * arr.itemsize
+    buf = np.empty(nbytes + alignment, dtype=np.uint8)
+    offset = -buf.ctypes.data % alignment
+    aligned = buf[offset:offset + nbytes].view(arr.dtype)
+    aligned[:] = arr
+    return aligned
+
+
+@njit(parallel=True, cache=True)
+def _score(indices, data, indptr, query_terms, out_score):
+    """
+    Sum the precomputed BM25 scores of the query terms into out_score
+
+    Takes the arrays of a CSC (documents x terms) matrix: the postings of
+    term t are indices[indptr[t]:indptr[t + 1]] with scores in data.
+    A document appears at most once per column, so the inner loop can run
+    in parallel without write conflicts.
+    """
+    for j in range(query_terms.shape[0]):
+        t = query_terms[j]
+        for i in prange(indptr[t], indptr[t + 1]):
+            out_score[indices[i]] += data[i]
+
+
+@njit(parallel=True, cache=True)
+def _probe(indices, data, indptr, query_terms, candidates, out_score):
+    """
+    Add the scores of the query terms for the candidate documents only,
+    looking each candidate up in the term's (sorted) posting list instead
+    of walking the whole list
+    """
+    for c in prange(candidates.shape[0]):
+        d = candidates[c]
+        for j in range(query_terms.shape[0]):
+            t = query_terms[j]
+            lo = indptr[t]
+            hi = indptr[t + 1]
+            pos = lo + np.searchsorted(indices[lo:hi], d)
+            if pos < hi and indices[pos] == d:
+                out_score[d] += data[pos]
+
 
 # ============================================
 # HYBRID SEARCH ENGINE
@@ -38,8 +101,13 @@ class VastrHybridSearch:
         self.products_list = list(self.products.find())
         print(f" Loaded {len(self.products_list)} products for search indexing")
 
+        # product_id -> product, for direct lookups
+        self.products_by_id = {p.get('product_id'): p for p in self.products_list}
+
         # Initialize search indices
-        self.bm25_index = None
+        self.bm25_vocab = {}
+        self.bm25_matrix = None
+        self.bm25_max_scores = None
         self.tfidf_vectorizer = None
         self.tfidf_matrix = None
         self.product_texts = []
@@ -175,7 +243,7 @@ class VastrHybridSearch:
         # Build BM25 Index
         print("    Building BM25 index...")
         tokenized_corpus = [text.split() for text in self.product_texts]
-        self.bm25_index = BM25Okapi(tokenized_corpus)
+        self._build_bm25_index(tokenized_corpus)
         print("    BM25 index built")
 
         # Build TF-IDF Index for Cosine Similarity
@@ -188,25 +256,147 @@ class VastrHybridSearch:
         self.tfidf_matrix = self.tfidf_vectorizer.fit_transform(self.product_texts)
         print("   TF-IDF index built")
 
+        # Per-product attributes as arrays so filters become vectorized masks
+        self.filter_brand_ids = np.array([p.get('brand_id') for p in self.products_list], dtype=object)
+        self.filter_product_types = np.array([p.get('product_type') for p in self.products_list], dtype=object)
+        self.filter_prices = np.array(
+            [p.get('price_min') if p.get('price_min') is not None else np.nan for p in self.products_list],
+            dtype=np.float64
+        )
+        self.filter_available = np.array([bool(p.get('available', False)) for p in self.products_list], dtype=bool)
+
         print(" Search indices ready!")
 
-    def _bm25_search(self, query: str, top_k: int = 50) -> List[Tuple[int, float]]:
+    def _build_bm25_index(self, tokenized_corpus: List[List[str]]):
+        """
+        Build the BM25 index as a CSC (documents x terms) matrix holding
+        the final BM25 score of every (term, document) pair, so a query
+        only has to sum the columns of its terms (BM25S-style eager scoring)
+        """
+        corpus_size = len(tokenized_corpus)
+        vocab = self.bm25_vocab
+
+        # Collect postings as parallel (term, doc, tf) columns
+        posting_terms, posting_docs, posting_tfs = [], [], []
+        doc_len = np.empty(corpus_size, dtype=np.float32)
+
+        for doc_id, tokens in enumerate(tokenized_corpus):
+            doc_len[doc_id] = len(tokens)
+            for term, tf in Counter(tokens).items():
+                posting_terms.append(vocab.setdefault(term, len(vocab)))
+                posting_docs.append(doc_id)
+                posting_tfs.append(tf)
+
+        # Group postings by term; the stable sort keeps doc ids ascending per term
+        posting_terms = np.asarray(posting_terms, dtype=np.int32)
+        order = np.argsort(posting_terms, kind='stable')
+        doc_ids = np.asarray(posting_docs, dtype=np.int32)[order]
+        tfs = np.asarray(posting_tfs, dtype=np.float32)[order]
+
+        df = np.bincount(posting_terms, minlength=len(vocab))
+        term_ptr = np.zeros(len(vocab) + 1, dtype=np.int32)
+        np.cumsum(df, out=term_ptr[1:])
+
+        idf = np.log(corpus_size - df + 0.5) - np.log(df + 0.5)
+
+        # Very common terms get a negative idf; floor them like BM25Okapi does
+        if len(idf):
+            idf[idf < 0] = BM25_EPSILON * idf.mean()
+
+        # Score every posting once, at index time
+        avgdl = doc_len.mean() if corpus_size else 0.0
+        posting_idf = np.repeat(idf, df).astype(np.float32)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_len[doc_ids] / avgdl)
+        data = (posting_idf * (tfs * (BM25_K1 + 1) / (tfs + norm))).astype(np.float32)
+
+        self.bm25_matrix = csc_matrix(
+            (data, doc_ids, term_ptr),
+            shape=(corpus_size, len(vocab))
+        )
+
+        # int32 ids / float32 scores in contiguous, 32-byte aligned buffers so
+        # the scoring loop vectorizes over 8 lanes per AVX2 instruction.
+        # Done after construction since csc_matrix may copy its inputs
+        self.bm25_matrix.indices = _aligned_copy(self.bm25_matrix.indices)
+        self.bm25_matrix.data = _aligned_copy(self.bm25_matrix.data)
+
+        # Upper bound of each term's contribution, used for MaxScore pruning
+        self.bm25_max_scores = (
+            np.maximum.reduceat(data, term_ptr[:-1]) if len(data) else np.empty(0, dtype=np.float32)
+        )
+
+    def warmup(self):
+        """Compile the scoring kernels before real traffic"""
+        m = self.bm25_matrix
+        no_terms = np.empty(0, dtype=np.int32)
+        scores = np.zeros(m.shape[0], dtype=np.float32)
+        _score(m.indices, m.data, m.indptr, no_terms, scores)
+        _probe(m.indices, m.data, m.indptr, no_terms, no_terms, scores)
+
+    def _bm25_search(
+            self,
+            query: str,
+            top_k: int = 50,
+            valid: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
         """
         Perform BM25 keyword search
+        valid: optional boolean mask of products allowed in the results
         Returns: List of (product_index, score) tuples
         """
-        query_tokens = self._preprocess_text(query).split()
-        bm25_scores = self.bm25_index.get_scores(query_tokens)
+        query_terms = np.array(
+            [self.bm25_vocab[token] for token in self._preprocess_text(query).split()
+             if token in self.bm25_vocab],
+            dtype=np.int32
+        )
+        bm25_scores = np.zeros(len(self.products_list), dtype=np.float32)
+        m = self.bm25_matrix
+
+        # MaxScore: score terms in decreasing order of their best possible
+        # contribution. Once the current k-th best score beats what all the
+        # remaining terms could add, no unseen document can reach the top K,
+        # so the remaining terms are only looked up for documents still in reach
+        query_terms = query_terms[np.argsort(-self.bm25_max_scores[query_terms], kind='stable')]
+        remaining = np.append(np.cumsum(self.bm25_max_scores[query_terms][::-1])[::-1], 0)
+
+        for j in range(len(query_terms)):
+            # Equivalent to bm25_matrix[:, [term]].sum(axis=1) without
+            # materializing the column slice
+            _score(m.indices, m.data, m.indptr, query_terms[j:j + 1], bm25_scores)
+
+            rest = remaining[j + 1]
+            if rest == 0 or top_k >= len(bm25_scores):
+                continue
+
+            ranked = bm25_scores if valid is None else np.where(valid, bm25_scores, 0)
+            threshold = np.partition(ranked, -top_k)[-top_k]
+            if threshold > rest:
+                candidates = np.flatnonzero(ranked >= threshold - rest).astype(np.int32)
+                _probe(m.indices, m.data, m.indptr, query_terms[j + 1:], candidates, bm25_scores)
+                break
+
+        if valid is not None:
+            bm25_scores[~valid] = 0
 
         # Get top K results
-        top_indices = np.argsort(bm25_scores)[::-1][:top_k]
+        if top_k < len(bm25_scores):
+            top_indices = np.argpartition(bm25_scores, -top_k)[-top_k:]
+        else:
+            top_indices = np.arange(len(bm25_scores))
+        top_indices = top_indices[np.argsort(bm25_scores[top_indices])[::-1]]
         results = [(idx, bm25_scores[idx]) for idx in top_indices if bm25_scores[idx] > 0]
 
         return results
 
-    def _cosine_search(self, query: str, top_k: int = 50) -> List[Tuple[int, float]]:
+    def _cosine_search(
+            self,
+            query: str,
+            top_k: int = 50,
+            valid: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
         """
         Perform Cosine Similarity semantic search
+        valid: optional boolean mask of products allowed in the results
         Returns: List of (product_index, score) tuples
         """
         # Transform query using TF-IDF
@@ -215,6 +405,9 @@ class VastrHybridSearch:
         # Calculate cosine similarity
         cosine_scores = cosine_similarity(query_vec, self.tfidf_matrix).flatten()
 
+        if valid is not None:
+            cosine_scores[~valid] = 0
+
         # Get top K results
         top_indices = np.argsort(cosine_scores)[::-1][:top_k]
         results = [(idx, cosine_scores[idx]) for idx in top_indices if cosine_scores[idx] > 0]
@@ -242,11 +435,28 @@ class VastrHybridSearch:
         Returns:
             List of products with hybrid scores
         """
+        return self._hybrid_rank(query, top_k, bm25_weight, cosine_weight, filters)[0]
+
+    def _hybrid_rank(
+            self,
+            query: str,
+            top_k: int,
+            bm25_weight: float,
+            cosine_weight: float,
+            filters: Optional[Dict]
+    ) -> Tuple[List[Dict], int]:
+        """
+        hybrid_search, also returning how many products matched in total
+        (before the top K cut)
+        """
         print(f"\n Searching for: '{query}'")
 
+        # Filters are applied before ranking, so the top K already satisfy them
+        valid = self._filter_mask(filters)
+
         # Perform both searches
-        bm25_results = self._bm25_search(query, top_k=100)
-        cosine_results = self._cosine_search(query, top_k=100)
+        bm25_results = self._bm25_search(query, top_k=100, valid=valid)
+        cosine_results = self._cosine_search(query, top_k=100, valid=valid)
 
         # Normalize scores to 0-1 range
         def normalize_scores(results):
@@ -280,11 +490,6 @@ class VastrHybridSearch:
         for idx, score in sorted_results[:top_k]:
             product = self.products_list[idx].copy()
 
-            # Apply filters if provided
-            if filters:
-                if not self._apply_filters(product, filters):
-                    continue
-
             product['search_score'] = float(score)
             product['bm25_score'] = float(bm25_normalized.get(idx, 0))
             product['cosine_score'] = float(cosine_normalized.get(idx, 0))
@@ -294,50 +499,80 @@ class VastrHybridSearch:
 
             results.append(product)
 
-        print(f" Found {len(results)} results")
-        return results
+        total_matches = self._count_matches(query, valid)
+        print(f" Found {total_matches} matches, returning {len(results)}")
+        return results, total_matches
+
+    def _count_matches(self, query: str, valid: Optional[np.ndarray] = None) -> int:
+        """
+        Number of products (passing the valid mask) that BM25 or cosine
+        scores above zero, counted from the index instead of the ranked
+        top lists so matches beyond the cut are included
+        """
+        matched = np.zeros(len(self.products_list), dtype=bool)
 
-    def _apply_filters(self, product: Dict, filters: Dict) -> bool:
-        """Apply filters to product"""
+        # BM25: documents with a positive posting for any query term
+        m = self.bm25_matrix
+        for token in set(self._preprocess_text(query).split()):
+            term = self.bm25_vocab.get(token)
+            if term is not None:
+                postings = slice(m.indptr[term], m.indptr[term + 1])
+                matched[m.indices[postings][m.data[postings] > 0]] = True
+
+        # Cosine: TF-IDF weights are non-negative, so any shared term gives a positive score
+        query_vec = self.tfidf_vectorizer.transform([self._preprocess_text(query)])
+        if query_vec.nnz:
+            matched |= self.tfidf_matrix[:, query_vec.indices].getnnz(axis=1) > 0
+
+        if valid is not None:
+            matched &= valid
+
+        return int(matched.sum())
+
+    def _filter_mask(self, filters: Dict) -> Optional[np.ndarray]:
+        """
+        Boolean mask of the products matching the filters
+        Returns None when there is nothing to filter
+        """
+        if not filters:
+            return None
+
+        valid = np.ones(len(self.products_list), dtype=bool)
 
         # Brand filter
         if 'brand_id' in filters:
-            if product.get('brand_id') != filters['brand_id']:
-                return False
+            valid &= self.filter_brand_ids == filters['brand_id']
 
-        # Price range filter
+        # Price range filter (missing price counts as 0 for min, infinite for max)
         if 'min_price' in filters:
-            price = product.get('price_min', 0)
-            if price < filters['min_price']:
-                return False
+            valid &= np.nan_to_num(self.filter_prices, nan=0.0) >= filters['min_price']
 
         if 'max_price' in filters:
-            price = product.get('price_min', float('inf'))
-            if price > filters['max_price']:
-                return False
+            valid &= np.nan_to_num(self.filter_prices, nan=np.inf) <= filters['max_price']
 
         # Product type filter
         if 'product_type' in filters:
-            if product.get('product_type') != filters['product_type']:
-                return False
+            valid &= self.filter_product_types == filters['product_type']
 
         # Availability filter
-        if 'available_only' in filters and filters['available_only']:
-            if not product.get('available', False):
-                return False
+        if filters.get('available_only'):
+            valid &= self.filter_available
 
-        return True
+        return valid
 
     def search_with_insights(
             self,
             query: str,
-            top_k: int = 10
+            top_k: int = 10,
+            filters: Dict = None
     ) -> Dict:
         """
         Search with additional recommendations and insights
         """
         # Perform hybrid search
-        results = self.hybrid_search(query, top_k=top_k)
+        results, total_matches = self._hybrid_rank(
+            query, top_k, bm25_weight=0.5, cosine_weight=0.5, filters=filters
+        )
 
         # Extract insights
         brands_found = {}
@@ -361,7 +596,7 @@ class VastrHybridSearch:
 
         return {
             'query': query,
-            'total_results': len(results),
+            'total_results': total_matches,
             'products': results,
             'insights': {
                 'brands': brands_found,
@@ -1,7 +1,10 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from routers import brands, general, products,search, email_service, image_search
+from routers.search import VastrHybridSearch
 from database import test_connection
 
 
@@ -11,6 +14,11 @@ async def lifespan(app: FastAPI):
     print(" Starting Vastr Fashion API...")
     print("=" * 50)
     test_connection()
+    await asyncio.to_thread(products.ensure_indexes)
+    # Build the search indices and compile the scoring kernels once, before
+    # serving, instead of on (and possibly concurrently for) the first request
+    app.state.search_engine = await asyncio.to_thread(VastrHybridSearch)
+    await asyncio.to_thread(app.state.search_engine.warmup)
     print("=" * 50)
     print(" API Ready!")
     print(" Docs: http://localhost:8000/docs")
@@ -18,13 +26,15 @@ async def lifespan(app: FastAPI):
     yield
     print("=" * 50)
     print(" Shutting down Vastr Fashion API...")
+    app.state.search_engine.close()
     print("=" * 50)
 
 app = FastAPI(
     title="Vastr Fashion API",
     description="Backend for Pakistani Fashion Platform",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Enable CORS
@@ -1,37 +1,83 @@
 # routers/products.py - COMPLETE WORKING VERSION
 from fastapi import APIRouter, Query, HTTPException
-from typing import List, Optional
-from pymongo import MongoClient
+from fastapi.responses import ORJSONResponse
+from typing import List, Optional, Tuple
 from bson import ObjectId
-import sys
+from functools import lru_cache
+from async_lru import alru_cache
+from database import get_products_collection
 
 router = APIRouter(prefix="/api/v1")
 
-client = MongoClient("mongodb://localhost:27017")
-db = client["vastr_fashion_db"]
-products_col = db["products"]
+products_col = get_products_collection()
 
 
-@router.get("/products")
-async def get_products(
-        limit: int = Query(24, le=100),
-        page: int = Query(1),
-        brand: Optional[List[str]] = Query(None),
-        category: Optional[List[str]] = Query(None),
-        price_min: Optional[int] = Query(None),
-        price_max: Optional[int] = Query(None),
-        sort: Optional[str] = Query(None),
-):
-    # Build query
+def ensure_indexes():
+    """Indexes for product lookups and keyset-paginated listings (run once at startup)"""
+    products_col.create_index([("product_id", 1)])
+    products_col.create_index([("price_min", 1), ("_id", 1)])
+
+
+def _keyset_filter(cursor: str, sort_key: str, sort_dir: int) -> dict:
+    """Filter selecting the products that come after `cursor` (the last _id of the previous page)"""
+    if not ObjectId.is_valid(cursor):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    last_id = ObjectId(cursor)
+    op = "$gt" if sort_dir == 1 else "$lt"
+    if sort_key == "_id":
+        return {"_id": {op: last_id}}
+
+    last = products_col.find_one({"_id": last_id}, {sort_key: 1})
+    if not last:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    last_value = last.get(sort_key)
+
+    # Null/missing values sort before every value, but $gt/$lt never match them
+    if last_value is None:
+        # Rest of the null group, then (ascending only) every non-null value
+        after = [{sort_key: None, "_id": {op: last_id}}]
+        if sort_dir == 1:
+            after.append({sort_key: {"$ne": None}})
+        return {"$or": after}
+
+    after = [
+        {sort_key: {op: last_value}},
+        {sort_key: last_value, "_id": {op: last_id}}
+    ]
+    if sort_dir == -1:
+        # Descending, the null group comes after every value
+        after.append({sort_key: None})
+    return {"$or": after}
+
+
+@lru_cache(maxsize=256)
+def _slugify(name: str) -> str:
+    """URL-friendly id for a brand/category name (the set of names is small and fixed)"""
+    return name.lower().replace(" ", "-").replace("&", "and")
+
+
+# Listing totals only need to be approximately fresh, so they are cached briefly
+# instead of re-counting the collection on every page request
+COUNT_CACHE_SIZE = 256
+COUNT_CACHE_TTL = 60  # seconds
+
+
+def _build_filters(
+        brand: Optional[Tuple[str, ...]],
+        category: Optional[Tuple[str, ...]],
+        price_min: Optional[int],
+        price_max: Optional[int],
+) -> dict:
+    """MongoDB filter for the product listing"""
     query = {}
 
     # Brand filter
     if brand:
-        query["brand_name"] = {"$in": brand}
+        query["brand_name"] = {"$in": list(brand)}
 
     # Category filter
     if category:
-        query["product_type"] = {"$in": category}
+        query["product_type"] = {"$in": list(category)}
 
     # Price filter - WORKING VERSION
     if price_min is not None and price_max is not None:
@@ -44,6 +90,40 @@ async def get_products(
         # Only max specified (e.g., "Under 3000")
         query["price_min"] = {"$lte": price_max}
 
+    return query
+
+
+@alru_cache(maxsize=COUNT_CACHE_SIZE, ttl=COUNT_CACHE_TTL)
+async def _cached_count(
+        brand: Optional[Tuple[str, ...]],
+        category: Optional[Tuple[str, ...]],
+        price_min: Optional[int],
+        price_max: Optional[int],
+) -> int:
+    """Total products matching the listing filters"""
+    filters = _build_filters(brand, category, price_min, price_max)
+    if not filters:
+        # Collection metadata instead of a full count
+        return products_col.estimated_document_count()
+    return products_col.count_documents(filters)
+
+
+@router.get("/products")
+async def get_products(
+        limit: int = Query(24, le=100),
+        page: int = Query(1),
+        cursor: Optional[str] = Query(None),
+        brand: Optional[List[str]] = Query(None),
+        category: Optional[List[str]] = Query(None),
+        price_min: Optional[int] = Query(None),
+        price_max: Optional[int] = Query(None),
+        sort: Optional[str] = Query(None),
+):
+    # Build query
+    brand = tuple(sorted(brand)) if brand else None
+    category = tuple(sorted(category)) if category else None
+    query = _build_filters(brand, category, price_min, price_max)
+
     # Sorting
     sort_key, sort_dir = "_id", -1
     if sort == "price_asc":
@@ -51,42 +131,40 @@ async def get_products(
     elif sort == "price_desc":
         sort_key, sort_dir = "price_min", -1
 
-    # Pagination
-    skip = (page - 1) * limit
-
-    # DEBUG OUTPUT - MUST SEE THIS IN TERMINAL
-    print("\n" + "="*80, file=sys.stderr, flush=True)
-    print(f" QUERY: {query}", file=sys.stderr, flush=True)
-    print(f" FILTERS: brands={brand}, categories={category}", file=sys.stderr, flush=True)
-    print(f" PRICE: min={price_min}, max={price_max}", file=sys.stderr, flush=True)
-    print(f" PAGINATION: page={page}, skip={skip}, limit={limit}", file=sys.stderr, flush=True)
-    print("="*80 + "\n", file=sys.stderr, flush=True)
+    # Pagination - keyset on the sort key (with _id as tiebreaker) when a cursor
+    # is given, so deep pages don't make MongoDB walk and discard skipped documents
+    if cursor:
+        skip = 0
+        keyset = _keyset_filter(cursor, sort_key, sort_dir)
+        query = {"$and": [query, keyset]} if query else keyset
+    else:
+        skip = (page - 1) * limit
 
     # Execute query
-    total = products_col.count_documents(query)
+    total = await _cached_count(brand, category, price_min, price_max)
+    sort_spec = [(sort_key, sort_dir)]
+    if sort_key != "_id":
+        sort_spec.append(("_id", sort_dir))
     products = list(
         products_col.find(query)
-        .sort(sort_key, sort_dir)
+        .sort(sort_spec)
         .skip(skip)
         .limit(limit)
     )
 
-    # DEBUG RESULTS
-    print(f" FOUND: {len(products)} products (Total: {total})", file=sys.stderr, flush=True)
-    if products and len(products) > 0:
-        print(f"   First product: {products[0].get('title', 'No title')[:50]} - PKR {products[0].get('price_min', 'N/A')}", file=sys.stderr, flush=True)
-        print(f"   Last product: {products[-1].get('title', 'No title')[:50]} - PKR {products[-1].get('price_min', 'N/A')}", file=sys.stderr, flush=True)
-
     # Convert ObjectId to string
     for p in products:
         p["_id"] = str(p["_id"])
 
-    return {
+    # Return the response directly so orjson serializes the product list
+    # without FastAPI's jsonable_encoder pass
+    return ORJSONResponse({
         "products": products,
         "total_products": total,
         "page": page,
-        "limit": limit
-    }
+        "limit": limit,
+        "next_cursor": products[-1]["_id"] if len(products) == limit else None
+    })
 
 
 @router.get("/brands")
@@ -99,7 +177,7 @@ async def get_brands():
     for b in products_col.aggregate(pipeline):
         name = b["_id"]
         result.append({
-            "brand_id": name.lower().replace(" ", "-").replace("&", "and"),
+            "brand_id": _slugify(name),
             "brand_name": name,
             "product_count": b["count"]
         })
@@ -116,7 +194,7 @@ async def get_categories():
     for c in products_col.aggregate(pipeline):
         if c["_id"]:
             result.append({
-                "category_id": c["_id"].lower().replace(" ", "-"),
+                "category_id": _slugify(c["_id"]),
                 "category_name": c["_id"],
                 "product_count": c["count"]
             })
@@ -1,22 +1,85 @@
 
-from fastapi import APIRouter, Query, HTTPException
-from typing import Optional, List, Dict
+from fastapi import APIRouter, Depends, Query, HTTPException, Request
+from fastapi.responses import ORJSONResponse
+from typing import Optional, List, Dict, Tuple
 from pydantic import BaseModel, Field
+from async_lru import alru_cache
 import sys
 
 sys.path.append('..')
 from backend.hybrid_search import VastrHybridSearch
 
-# Initialize search engine (singleton pattern)
-search_engine = None
 
+def get_search_engine(request: Request) -> VastrHybridSearch:
+    """Search engine built once at startup (see lifespan in main.py)"""
+    return request.app.state.search_engine
 
-def get_search_engine():
-    """Get or create search engine instance"""
-    global search_engine
-    if search_engine is None:
-        search_engine = VastrHybridSearch()
-    return search_engine
+
+# ============================================
+# RESULT CACHE
+# ============================================
+# Popular queries repeat constantly, so identical searches are served from
+# memory for a few minutes instead of being re-ranked every time.
+# Keys are (normalized query, sorted filter items, limit[, weights]).
+SEARCH_CACHE_SIZE = 2048
+SEARCH_CACHE_TTL = 300  # seconds
+
+
+def _normalize_query(q: str) -> str:
+    """Normalize query text so trivially different queries share a cache entry"""
+    return ' '.join(q.lower().split())
+
+
+def _filters_key(filters: Dict) -> Tuple:
+    """Hashable form of a filters dict"""
+    return tuple(sorted(filters.items()))
+
+
+@alru_cache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+async def _cached_search_with_insights(
+        engine: VastrHybridSearch,
+        query: str,
+        filters_key: Tuple,
+        limit: int
+) -> Dict:
+    """Cached search_with_insights for the /search endpoint"""
+    return engine.search_with_insights(
+        query=query,
+        top_k=limit,
+        filters=dict(filters_key)
+    )
+
+
+@alru_cache(maxsize=SEARCH_CACHE_SIZE, ttl=SEARCH_CACHE_TTL)
+async def _cached_hybrid_search(
+        engine: VastrHybridSearch,
+        query: str,
+        filters_key: Tuple,
+        limit: int,
+        bm25_weight: float,
+        cosine_weight: float
+) -> List[Dict]:
+    """Cached hybrid_search for the /advanced endpoint"""
+    return engine.hybrid_search(
+        query=query,
+        top_k=limit,
+        bm25_weight=bm25_weight,
+        cosine_weight=cosine_weight,
+        filters=dict(filters_key)
+    )
+
+
+def _cache_stats(cached_func) -> Dict:
+    """Hit/miss counters of a cached search function"""
+    info = cached_func.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": round(info.hits / lookups, 3) if lookups else 0.0,
+        "size": info.currsize,
+        "max_size": info.maxsize
+    }
 
 class SearchFilters(BaseModel):
     """Search filters model"""
@@ -80,7 +143,8 @@ async def search_products(
         max_price: Optional[float] = Query(None, description="Maximum price in PKR"),
         available_only: bool = Query(False, description="Show only available products"),
         bm25_weight: float = Query(0.5, ge=0, le=1, description="BM25 algorithm weight (0-1)"),
-        cosine_weight: float = Query(0.5, ge=0, le=1, description="Cosine similarity weight (0-1)")
+        cosine_weight: float = Query(0.5, ge=0, le=1, description="Cosine similarity weight (0-1)"),
+        engine: VastrHybridSearch = Depends(get_search_engine)
 ):
     """
     Search products using Hybrid Search (BM25 + Cosine Similarity)
@@ -103,32 +167,24 @@ async def search_products(
         if available_only:
             filters['available_only'] = True
 
-        # Get search engine
-        engine = get_search_engine()
-
-        # Perform search with insights
-        results = engine.search_with_insights(
-            query=q,
-            top_k=limit
+        # Perform search with insights (served from cache on repeats)
+        results = await _cached_search_with_insights(
+            engine,
+            _normalize_query(q),
+            _filters_key(filters),
+            limit
         )
 
-        # Apply additional filters if needed
-        if filters:
-            filtered_products = []
-            for product in results['products']:
-                if engine._apply_filters(product, filters):
-                    filtered_products.append(product)
-            results['products'] = filtered_products
-            results['total_results'] = len(filtered_products)
-
-        return {
+        # Returned directly so orjson serializes the product list without
+        # FastAPI's pure-Python jsonable_encoder pass over every product dict
+        return ORJSONResponse({
             "query": q,
             "total_results": results['total_results'],
             "results_shown": len(results['products']),
             "products": results['products'],
             "insights": results['insights'],
             "filters_applied": filters
-        }
+        })
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
@@ -137,7 +193,8 @@ async def search_products(
 @router.get("/suggestions")
 async def get_search_suggestions(
         q: str = Query(..., min_length=2, description="Partial search query"),
-        limit: int = Query(5, ge=1, le=10, description="Number of suggestions")
+        limit: int = Query(5, ge=1, le=10, description="Number of suggestions"),
+        engine: VastrHybridSearch = Depends(get_search_engine)
 ):
     """
     Get search suggestions/autocomplete
@@ -146,8 +203,6 @@ async def get_search_suggestions(
     - `/api/v1/search/suggestions?q=emb` → Returns "embroidered", "embroidered lawn", etc.
     """
     try:
-        engine = get_search_engine()
-
         # Get all unique titles containing the query
         suggestions = set()
         query_lower = q.lower()
@@ -189,7 +244,8 @@ async def advanced_search(
         filters: SearchFilters,
         limit: int = Query(20, ge=1, le=100),
         bm25_weight: float = Query(0.5, ge=0, le=1),
-        cosine_weight: float = Query(0.5, ge=0, le=1)
+        cosine_weight: float = Query(0.5, ge=0, le=1),
+        engine: VastrHybridSearch = Depends(get_search_engine)
 ):
     """
     Advanced search with POST body for complex filters
@@ -212,24 +268,22 @@ async def advanced_search(
         # Convert filters to dict
         filters_dict = {k: v for k, v in filters.dict().items() if v is not None}
 
-        # Get search engine
-        engine = get_search_engine()
-
-        # Perform hybrid search
-        results = engine.hybrid_search(
-            query=query,
-            top_k=limit,
-            bm25_weight=bm25_weight,
-            cosine_weight=cosine_weight,
-            filters=filters_dict
+        # Perform hybrid search (served from cache on repeats)
+        results = await _cached_hybrid_search(
+            engine,
+            _normalize_query(query),
+            _filters_key(filters_dict),
+            limit,
+            bm25_weight,
+            cosine_weight
         )
 
-        return {
+        return ORJSONResponse({
             "query": query,
             "total_results": len(results),
             "filters_applied": filters_dict,
             "products": results
-        }
+        })
 
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Advanced search error: {str(e)}")
@@ -238,7 +292,8 @@ async def advanced_search(
 @router.get("/similar/{product_id}")
 async def find_similar_products(
         product_id: str,
-        limit: int = Query(10, ge=1, le=50, description="Number of similar products")
+        limit: int = Query(10, ge=1, le=50, description="Number of similar products"),
+        engine: VastrHybridSearch = Depends(get_search_engine)
 ):
     """
     Find similar products based on a given product ID
@@ -247,14 +302,8 @@ async def find_similar_products(
     - `/api/v1/search/similar/8492810567879?limit=5`
     """
     try:
-        engine = get_search_engine()
-
         # Find the product
-        target_product = None
-        for product in engine.products_list:
-            if product.get('product_id') == product_id:
-                target_product = product
-                break
+        target_product = engine.products_by_id.get(product_id)
 
         if not target_product:
             raise HTTPException(status_code=404, detail="Product not found")
@@ -273,12 +322,12 @@ async def find_similar_products(
         # Remove the target product from results
         similar_products = [p for p in results if p.get('product_id') != product_id][:limit]
 
-        return {
+        return ORJSONResponse({
             "target_product_id": product_id,
             "target_product_title": target_product.get('title'),
             "similar_products_count": len(similar_products),
             "similar_products": similar_products
-        }
+        })
 
     except HTTPException:
         raise
@@ -313,17 +362,19 @@ async def get_trending_searches(limit: int = Query(10, ge=1, le=20)):
 
 
 @router.get("/stats")
-async def get_search_stats():
+async def get_search_stats(engine: VastrHybridSearch = Depends(get_search_engine)):
     """
     Get search engine statistics
     """
     try:
-        engine = get_search_engine()
-
         return {
             "total_products_indexed": len(engine.products_list),
             "search_algorithms": ["BM25", "TF-IDF + Cosine Similarity"],
             "indexing_status": "ready",
+            "result_cache": {
+                "search": _cache_stats(_cached_search_with_insights),
+                "advanced": _cache_stats(_cached_hybrid_search)
+            },
             "supported_features": [
                 "Keyword search (BM25)",
                 "Semantic search (Cosine Similarity)",
@@ -1,10 +1,18 @@
-from pymongo import MongoClient
-import requests
-import time
+from pymongo import AsyncMongoClient, UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
+from bson.raw_bson import RawBSONDocument
+import asyncio
+import httpx
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import Dict, List, Set
+from typing import Dict, List, Optional, Set
+from urllib.parse import quote
+from uuid import uuid4
 import json
-import schedule
+import zlib
+import logging
+import logging.handlers
+from apscheduler.schedulers.blocking import BlockingScheduler
 
 # ============================================
 # CONFIGURATION
@@ -98,7 +106,33 @@ BRANDS = {
 }
 
 SYNC_INTERVAL_HOURS = 6  # Sync every 6 hours
+DELTA_SYNC_OVERLAP = timedelta(hours=1)  # re-fetch a margin before the last sync to not miss edits
 DELAY_BETWEEN_REQUESTS = 2  # seconds
+BULK_BATCH_SIZE = 1000  # write ops per bulk_write round-trip
+MAX_REQUESTS_PER_HOST = 2  # concurrent requests to one brand's site
+MAX_RETRIES = 3  # retries on 429/5xx responses
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+SYNC_LOG_FILE = "sync.log"  # per-product details, the console only gets summaries
+
+# Connection pool settings of the async client opened for each sync run
+MONGO_CLIENT_OPTIONS = {
+    'maxPoolSize': 50,
+    'minPoolSize': 5,
+    'maxIdleTimeMS': 300000,
+    'compressors': 'zstd,zlib',
+    'retryWrites': True
+}
+
+# Per-product messages are buffered and written to the log file in chunks
+log = logging.getLogger('vastr.sync')
+log.setLevel(logging.INFO)
+log.propagate = False
+_log_handler = logging.handlers.MemoryHandler(
+    1000,
+    target=logging.FileHandler(SYNC_LOG_FILE, delay=True)
+)
+_log_handler.target.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+log.addHandler(_log_handler)
 
 
 # ============================================
@@ -111,7 +145,14 @@ class VastrDataSync:
 
     def __init__(self):
         """Initialize sync manager"""
-        self.client = MongoClient(MONGO_URI)
+        print(" Data Sync Manager initialized")
+
+    async def connect(self):
+        """
+        Open the async MongoDB client for a sync run
+        An async client is bound to the event loop it runs on, so each run opens its own
+        """
+        self.client = AsyncMongoClient(MONGO_URI, **MONGO_CLIENT_OPTIONS)
         self.db = self.client[DATABASE_NAME]
 
         # Collections
@@ -120,12 +161,50 @@ class VastrDataSync:
         self.price_history = self.db['price_history']
         self.sync_logs = self.db['sync_logs']
         self.removed_products = self.db['removed_products']
+        self.http_cache = self.db['http_cache']
 
-        print(" Data Sync Manager initialized")
+        # Read-only view that hands back undecoded BSON, for id-only scans
+        self.raw_products = self.products.with_options(
+            codec_options=self.products.codec_options.with_options(document_class=RawBSONDocument)
+        )
+
+        await self._ensure_indexes()
+
+    async def _ensure_indexes(self):
+        """Create the indexes used by sync lookups (no-op if they already exist)"""
+        product_key = [('brand_id', 1), ('product_id', 1)]
 
-    def fetch_live_products(self, brand_id: str, collection: str) -> List[Dict]:
+        # Any existing (brand_id, product_id) index counts, a non-unique fallback from an
+        # earlier run would otherwise make the unique create_index fail on every sync
+        existing = await self.products.index_information()
+        if not any(info['key'] == product_key for info in existing.values()):
+            try:
+                await self.products.create_index(product_key, unique=True)
+            except OperationFailure as e:
+                # Existing duplicates block a unique index, still index the lookups
+                print(f"    Unique product index not created ({e}), using non-unique")
+                await self.products.create_index(product_key)
+
+        await self.price_history.create_index([('product_id', 1), ('date', -1)])
+        await self.removed_products.create_index([('brand_id', 1), ('product_id', 1)])
+        await self.http_cache.create_index([('brand_id', 1), ('collection', 1), ('page', 1)], unique=True)
+
+    async def fetch_live_products(
+            self,
+            client: httpx.AsyncClient,
+            brand_id: str,
+            collection: str,
+            host_lock: asyncio.Semaphore,
+            page_cache: Dict,
+            cache_ops: List,
+            updated_at_min: Optional[datetime] = None
+    ) -> List[Dict]:
         """
         Fetch current products from brand's Shopify API
+        host_lock caps concurrent requests to the brand's site to stay polite
+        page_cache holds the last ETag/body per page, pages answered 304 reuse that body
+        New cache entries are queued on cache_ops
+        updated_at_min: only fetch products edited since then (delta sync), pages are not cached
         """
         brand_config = BRANDS[brand_id]
         base_url = brand_config['base_url']
@@ -133,16 +212,36 @@ class VastrDataSync:
         page = 1
         max_pages = 50
 
+        delta_param = ''
+        if updated_at_min:
+            delta_param = f"&updated_at_min={quote(updated_at_min.astimezone().isoformat())}"
+            page_cache = {}
+
+        print(f"    Fetching collection: {brand_id}/{collection}")
+
         while page <= max_pages:
-            url = f"{base_url}/collections/{collection}/products.json?page={page}&limit=250"
+            url = f"{base_url}/collections/{collection}/products.json?page={page}&limit=250{delta_param}"
 
-            try:
-                response = requests.get(url, timeout=10)
+            cached = page_cache.get((brand_id, collection, page))
+            headers = {}
+            if cached:
+                if cached.get('etag'):
+                    headers['If-None-Match'] = cached['etag']
+                if cached.get('last_modified'):
+                    headers['If-Modified-Since'] = cached['last_modified']
 
-                if response.status_code != 200:
+            try:
+                response = await self._get_with_retry(client, url, host_lock, headers)
+
+                if response.status_code == 304 and cached:
+                    data = json.loads(zlib.decompress(cached['body']))
+                elif response.status_code == 200:
+                    data = response.json()
+                    if not updated_at_min:
+                        self._queue_page_cache(brand_id, collection, page, response, cache_ops)
+                else:
                     break
 
-                data = response.json()
                 products = data.get('products', [])
 
                 if not products:
@@ -150,7 +249,6 @@ class VastrDataSync:
 
                 all_products.extend(products)
                 page += 1
-                time.sleep(DELAY_BETWEEN_REQUESTS)
 
             except Exception as e:
                 print(f"   Error fetching {brand_id}/{collection}: {e}")
@@ -158,16 +256,123 @@ class VastrDataSync:
 
         return all_products
 
-    def sync_brand(self, brand_id: str) -> Dict:
+    async def _get_with_retry(
+            self,
+            client: httpx.AsyncClient,
+            url: str,
+            host_lock: asyncio.Semaphore,
+            headers: Dict = None
+    ) -> httpx.Response:
+        """GET a url, retrying 429/5xx responses with exponential backoff"""
+        for attempt in range(MAX_RETRIES + 1):
+            async with host_lock:
+                response = await client.get(url, headers=headers)
+                # Keep the delay inside the critical section so it spaces
+                # out requests to this host without blocking other brands
+                await asyncio.sleep(DELAY_BETWEEN_REQUESTS)
+
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+                return response
+
+            await asyncio.sleep(DELAY_BETWEEN_REQUESTS * 2 ** attempt)
+
+        return response
+
+    def _queue_page_cache(
+            self,
+            brand_id: str,
+            collection: str,
+            page: int,
+            response: httpx.Response,
+            cache_ops: List
+    ):
+        """Queue the validators and compressed body of a page for the next conditional GET"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if not etag and not last_modified:
+            return
+
+        cache_ops.append(UpdateOne(
+            {'brand_id': brand_id, 'collection': collection, 'page': page},
+            {'$set': {
+                'etag': etag,
+                'last_modified': last_modified,
+                'body': zlib.compress(response.content),
+                'fetched_at': datetime.now()
+            }},
+            upsert=True
+        ))
+
+    async def fetch_brands(
+            self,
+            brand_ids: List[str],
+            since: Dict[str, datetime] = None
+    ) -> Dict[str, Dict[str, Dict]]:
         """
-        Sync a single brand's data
+        Fetch live products of several brands concurrently
+        Collections of the same brand share one semaphore, different brands run in parallel
+        since: {brand_id: datetime} to only fetch products edited after it (brands missing get everything)
+        Returns: {brand_id: {product_id: product}} deduplicated across collections
+        """
+        since = since or {}
+        host_locks = defaultdict(lambda: asyncio.Semaphore(MAX_REQUESTS_PER_HOST))
+
+        # Load the cached pages up front so the fetch loop never waits on the database
+        page_cache = {
+            (doc['brand_id'], doc['collection'], doc['page']): doc
+            async for doc in self.http_cache.find({'brand_id': {'$in': brand_ids}}, projection={'_id': 0})
+        }
+        cache_ops = []
+        jobs = [
+            (brand_id, collection)
+            for brand_id in brand_ids
+            for collection in BRANDS[brand_id]['collections']
+        ]
+
+        limits = httpx.Limits(
+            max_connections=len(brand_ids) * MAX_REQUESTS_PER_HOST,
+            max_keepalive_connections=len(brand_ids) * MAX_REQUESTS_PER_HOST
+        )
+        # transport retries cover connection failures, _get_with_retry covers 429/5xx
+        transport = httpx.AsyncHTTPTransport(http2=True, retries=MAX_RETRIES, limits=limits)
+
+        async with httpx.AsyncClient(transport=transport, timeout=30) as client:
+            results = await asyncio.gather(*[
+                self.fetch_live_products(
+                    client, brand_id, collection, host_locks[brand_id], page_cache, cache_ops,
+                    since.get(brand_id)
+                )
+                for brand_id, collection in jobs
+            ])
+
+        if cache_ops:
+            try:
+                await self.http_cache.bulk_write(cache_ops, ordered=False)
+            except BulkWriteError as e:
+                print(f"    HTTP cache: {len(e.details.get('writeErrors', []))} pages not saved")
+
+        live_products = {brand_id: {} for brand_id in brand_ids}
+        for (brand_id, _), products in zip(jobs, results):
+            products_map = live_products[brand_id]
+            for product in products:
+                products_map[str(product['id'])] = product
+
+        return live_products
+
+    async def sync_brand(self, brand_id: str, live_products_map: Dict[str, Dict] = None, full: bool = True) -> Dict:
+        """
+        Sync a single brand's data (runs inside a connected sync run, see sync_all_brands)
+        live_products_map: already fetched {product_id: product} of the brand (fetched here if None)
+        full: diff against every stored product and detect removals, otherwise
+              only the products edited since the last sync are fetched and applied
         Returns sync statistics
         """
         brand_config = BRANDS[brand_id]
         brand_name = brand_config['name']
+        base_url = brand_config['base_url']
 
         print(f"\n{'=' * 60}")
-        print(f"Syncing: {brand_name}")
+        print(f"Syncing: {brand_name} ({'full' if full else 'delta'})")
         print(f"{'=' * 60}")
 
         stats = {
@@ -175,138 +380,210 @@ class VastrDataSync:
             'brand_name': brand_name,
             'new_products': 0,
             'updated_products': 0,
+            'unchanged_products': 0,
             'price_changes': 0,
             'removed_products': 0,
             'errors': 0,
+            'full_sync': full,
             'start_time': datetime.now()
         }
 
-        # Get existing product IDs from database
-        existing_products = self.products.find({'brand_id': brand_id})
-        existing_ids = {str(p['product_id']) for p in existing_products}
-
         # Fetch live products
-        live_products = []
-        for collection in brand_config['collections']:
-            print(f"    Fetching collection: {collection}")
-            products = self.fetch_live_products(brand_id, collection)
-            live_products.extend(products)
-
-        # Deduplicate
-        live_products_map = {str(p['id']): p for p in live_products}
-        live_ids = set(live_products_map.keys())
-
-        print(f"\n    Comparison:")
+        if live_products_map is None:
+            since = None if full else await self._delta_since(brand_id)
+            full = since is None
+            stats['full_sync'] = full
+            live_products_map = (
+                await self.fetch_brands([brand_id], {brand_id: since} if since else None)
+            )[brand_id]
+
+        # Set-like view, no copy needed for the diffs below
+        live_ids = live_products_map.keys()
+
+        # Get existing product IDs from database: all of them for a full diff,
+        # only the fetched ones for a delta sync
+        # Covered query: only product_id is read, straight from the index,
+        # and returned as raw BSON so no dict is built per product
+        existing_query = {'brand_id': brand_id}
+        if not full:
+            existing_query['product_id'] = {'$in': list(live_ids)}
+        existing_products = self.raw_products.find(
+            existing_query,
+            projection={'product_id': 1, '_id': 0}
+        ).hint([('brand_id', 1), ('product_id', 1)]).batch_size(1000)
+        existing_ids = {str(p['product_id']) async for p in existing_products}
+
+        print(f"\n    Comparison ({brand_name}):")
         print(f"      Existing in DB: {len(existing_ids)}")
         print(f"      Live on website: {len(live_ids)}")
 
-        # Detect changes
+        # Detect changes, removals are only visible to a full diff
         new_ids = live_ids - existing_ids
-        removed_ids = existing_ids - live_ids
+        removed_ids = existing_ids - live_ids if full else set()
         common_ids = existing_ids & live_ids
 
         print(f"      New products: {len(new_ids)}")
         print(f"      Removed products: {len(removed_ids)}")
         print(f"      To check for updates: {len(common_ids)}")
 
+        # Writes are queued per collection and sent in unordered batches
+        ops = []
+        price_entries = []
+
         # Process new products
         for product_id in new_ids:
             try:
                 live_product = live_products_map[product_id]
-                parsed = self._parse_product(live_product, brand_id, brand_name)
+                parsed = self._parse_product(live_product, brand_id, brand_name, base_url)
 
-                self.products.insert_one(parsed)
+                ops.append(UpdateOne(
+                    {'product_id': product_id, 'brand_id': brand_id},
+                    {'$set': parsed},
+                    upsert=True
+                ))
                 stats['new_products'] += 1
 
                 # Log price
                 if parsed.get('price_min'):
-                    self._log_price(product_id, brand_id, parsed['price_min'])
+                    price_entries.append(self._price_entry(product_id, brand_id, parsed['price_min']))
 
             except Exception as e:
-                print(f"    Error adding new product {product_id}: {e}")
+                log.error("Error adding new product %s/%s: %s", brand_id, product_id, e)
                 stats['errors'] += 1
+                continue
 
-        # Process removed products
-        for product_id in removed_ids:
-            try:
-                # Move to removed_products collection
-                product = self.products.find_one({
-                    'product_id': product_id,
-                    'brand_id': brand_id
-                })
-
-                if product:
-                    product['removed_at'] = datetime.now()
-                    self.removed_products.insert_one(product)
-
-                    # Delete from main products
-                    self.products.delete_one({
-                        'product_id': product_id,
-                        'brand_id': brand_id
-                    })
-
-                    stats['removed_products'] += 1
+            if len(ops) >= BULK_BATCH_SIZE:
+                await self._flush_bulk(self.products, ops, stats)
 
-            except Exception as e:
-                print(f"    Error removing product {product_id}: {e}")
-                stats['errors'] += 1
-
-        # Process updated products
-        for product_id in common_ids:
+        # Process removed products: archive them, then delete by _id
+        if removed_ids:
             try:
-                live_product = live_products_map[product_id]
-                parsed = self._parse_product(live_product, brand_id, brand_name)
-
-                # Get existing product
-                existing = self.products.find_one({
-                    'product_id': product_id,
+                removed_at = datetime.now()
+                removed_docs = await self.products.find({
+                    'product_id': {'$in': list(removed_ids)},
                     'brand_id': brand_id
-                })
+                }).to_list()
 
-                # Check for price change
-                old_price = existing.get('price_min', 0)
-                new_price = parsed.get('price_min', 0)
+                for product in removed_docs:
+                    product['removed_at'] = removed_at
 
-                if old_price != new_price and new_price > 0:
-                    stats['price_changes'] += 1
-                    self._log_price(product_id, brand_id, new_price, old_price)
-                    print(f"    Price change: {product_id} - PKR {old_price:,.0f} → PKR {new_price:,.0f}")
+                # Only delete what actually made it into the archive
+                failed = await self._insert_many(self.removed_products, removed_docs, stats)
+                archived_ids = [p['_id'] for i, p in enumerate(removed_docs) if i not in failed]
+                if archived_ids:
+                    await self.products.delete_many({'_id': {'$in': archived_ids}})
 
-                # Update product
-                parsed['last_updated'] = datetime.now()
-                parsed['scraped_at'] = existing.get('scraped_at')  # Keep original scrape date
-
-                self.products.update_one(
-                    {'product_id': product_id, 'brand_id': brand_id},
-                    {'$set': parsed}
-                )
-
-                stats['updated_products'] += 1
+                stats['removed_products'] += len(archived_ids)
 
             except Exception as e:
-                print(f"    Error updating product {product_id}: {e}")
+                print(f"    Error removing products: {e}")
                 stats['errors'] += 1
 
+        # Load the stored updated_at stamps in one query
+        stored_updated_at = {
+            d['product_id']: d.get('updated_at')
+            async for d in self.products.find(
+                {'brand_id': brand_id, 'product_id': {'$in': list(common_ids)}},
+                projection={'_id': 0, 'product_id': 1, 'updated_at': 1}
+            )
+        } if common_ids else {}
+
+        # Re-parsed prices are staged and diffed against products server-side.
+        # The name is unique per run so an overlapping sync of the same brand
+        # (delta and full jobs) can't clear this run's staged prices
+        staging = self.db[f'staging_{brand_id}_{uuid4().hex}']
+        staged = []
+
+        try:
+            # Process updated products
+            for product_id in common_ids:
+                try:
+                    live_product = live_products_map[product_id]
+
+                    # Shopify bumps updated_at on every edit (prices included),
+                    # so an unchanged stamp means there is nothing to re-parse
+                    if live_product.get('updated_at') and live_product['updated_at'] == stored_updated_at.get(product_id):
+                        ops.append(UpdateOne(
+                            {'product_id': product_id, 'brand_id': brand_id},
+                            {'$set': {'last_updated': datetime.now()}}
+                        ))
+                        stats['unchanged_products'] += 1
+                    else:
+                        parsed = self._parse_product(live_product, brand_id, brand_name, base_url)
+                        staged.append({
+                            'product_id': product_id,
+                            'brand_id': brand_id,
+                            'price_min': parsed.get('price_min')
+                        })
+
+                        # scraped_at is not in parsed, so $set keeps the original scrape date
+                        parsed['last_updated'] = datetime.now()
+                        ops.append(UpdateOne(
+                            {'product_id': product_id, 'brand_id': brand_id},
+                            {'$set': parsed}
+                        ))
+                        stats['updated_products'] += 1
+
+                except Exception as e:
+                    log.error("Error updating product %s/%s: %s", brand_id, product_id, e)
+                    stats['errors'] += 1
+                    continue
+
+                if len(ops) >= BULK_BATCH_SIZE:
+                    # Diff before the updates overwrite the stored prices
+                    await self._diff_prices(staging, staged, brand_id, price_entries, stats)
+                    await self._flush_bulk(self.products, ops, stats)
+
+            await self._diff_prices(staging, staged, brand_id, price_entries, stats)
+            await self._flush_bulk(self.products, ops, stats)
+            await self._insert_many(self.price_history, price_entries, stats)
+        finally:
+            await staging.drop()
+
         # Update brand stats
         stats['end_time'] = datetime.now()
         stats['duration_seconds'] = (stats['end_time'] - stats['start_time']).total_seconds()
 
-        self._update_brand_metadata(brand_id, stats)
-        self._log_sync(stats)
+        await self._update_brand_metadata(brand_id, stats)
+        await self._log_sync(stats)
 
         # Print summary
-        print(f"\n    Sync Complete:")
+        print(f"\n    Sync Complete ({brand_name}):")
         print(f"      New: {stats['new_products']}")
         print(f"      Updated: {stats['updated_products']}")
+        print(f"      Unchanged: {stats['unchanged_products']}")
         print(f"      Price changes: {stats['price_changes']}")
         print(f"      Removed: {stats['removed_products']}")
         print(f"      Errors: {stats['errors']}")
         print(f"      Duration: {stats['duration_seconds']:.1f}s")
+        print(f"      Details: {SYNC_LOG_FILE}")
+
+        _log_handler.flush()
 
         return stats
 
-    def sync_all_brands(self) -> Dict:
+    async def _delta_since(self, brand_id: str) -> Optional[datetime]:
+        """Cut-off for a delta sync of the brand, None if it was never synced"""
+        last_synced = await self.get_last_sync_time(brand_id)
+        return last_synced - DELTA_SYNC_OVERLAP if last_synced else None
+
+    def sync_all_brands(self, full: bool = True) -> Dict:
+        """
+        Sync every brand
+        full: diff every brand against the database, otherwise run delta syncs
+              (brands never synced before always get a full sync)
+        """
+        return asyncio.run(self._sync_all_brands(full))
+
+    async def _sync_all_brands(self, full: bool) -> Dict:
+        """Sync all brands concurrently on one event loop, each fetching and writing on its own"""
+        await self.connect()
+        try:
+            return await self._gather_brands(full)
+        finally:
+            await self.client.close()
 
+    async def _gather_brands(self, full: bool) -> Dict:
         overall_stats = {
             'start_time': datetime.now(),
             'brands_synced': 0,
@@ -317,10 +594,18 @@ class VastrDataSync:
             'total_errors': 0
         }
 
-        for brand_id in BRANDS.keys():
-            try:
-                stats = self.sync_brand(brand_id)
+        # Brands are different hosts and different documents, so they sync side by side
+        print(" Syncing all brands...")
+        results = await asyncio.gather(
+            *[self.sync_brand(brand_id, full=full) for brand_id in BRANDS],
+            return_exceptions=True
+        )
 
+        for brand_id, stats in zip(BRANDS, results):
+            if isinstance(stats, Exception):
+                print(f"\n Failed to sync {brand_id}: {stats}")
+                overall_stats['total_errors'] += 1
+            else:
                 overall_stats['brands_synced'] += 1
                 overall_stats['total_new'] += stats['new_products']
                 overall_stats['total_updated'] += stats['updated_products']
@@ -328,13 +613,6 @@ class VastrDataSync:
                 overall_stats['total_removed'] += stats['removed_products']
                 overall_stats['total_errors'] += stats['errors']
 
-                # Delay between brands
-                time.sleep(3)
-
-            except Exception as e:
-                print(f"\n Failed to sync {brand_id}: {e}")
-                overall_stats['total_errors'] += 1
-
         overall_stats['end_time'] = datetime.now()
         overall_stats['total_duration'] = (overall_stats['end_time'] - overall_stats['start_time']).total_seconds()
 
@@ -352,7 +630,7 @@ class VastrDataSync:
 
         return overall_stats
 
-    def _parse_product(self, product: Dict, brand_id: str, brand_name: str) -> Dict:
+    def _parse_product(self, product: Dict, brand_id: str, brand_name: str, base_url: str) -> Dict:
         """Parse Shopify product to standard format"""
 
         # Handle tags - can be string or list
@@ -374,26 +652,34 @@ class VastrDataSync:
             'updated_at': product.get('updated_at'),
             'published_at': product.get('published_at'),
             'tags': tags,
-            'url': f"{BRANDS[brand_id]['base_url']}/products/{product.get('handle')}",
+            'url': f"{base_url}/products/{product.get('handle')}",
             'description': product.get('body_html', ''),
             'variants': [],
             'images': [],
             'last_updated': datetime.now()
         }
 
-        # Variants
+        # Variants, with price range and availability in the same pass
+        price_min = price_max = None
+        any_available = False
         for variant in product.get('variants', []):
+            price = float(variant.get('price', 0))
+            compare_at_price = variant.get('compare_at_price')
             parsed['variants'].append({
                 'id': variant.get('id'),
                 'title': variant.get('title'),
-                'price': float(variant.get('price', 0)),
-                'compare_at_price': float(variant.get('compare_at_price', 0)) if variant.get(
-                    'compare_at_price') else None,
+                'price': price,
+                'compare_at_price': float(compare_at_price) if compare_at_price else None,
                 'sku': variant.get('sku'),
                 'available': variant.get('available'),
                 'inventory_quantity': variant.get('inventory_quantity', 0),
             })
 
+            if price:
+                price_min = price if price_min is None else min(price_min, price)
+                price_max = price if price_max is None else max(price_max, price)
+            any_available = any_available or bool(variant.get('available'))
+
         # Images
         for img in product.get('images', []):
             parsed['images'].append({
@@ -403,20 +689,96 @@ class VastrDataSync:
             })
 
         # Price range
-        prices = [v['price'] for v in parsed['variants'] if v.get('price')]
-        if prices:
-            parsed['price_min'] = min(prices)
-            parsed['price_max'] = max(prices)
+        if price_min is not None:
+            parsed['price_min'] = price_min
+            parsed['price_max'] = price_max
             parsed['currency'] = 'PKR'
 
         # Availability
-        parsed['available'] = any(v.get('available') for v in parsed['variants'])
+        parsed['available'] = any_available
 
         return parsed
 
-    def _log_price(self, product_id: str, brand_id: str, new_price: float, old_price: float = None):
-        """Log price change"""
-        price_entry = {
+    async def _diff_prices(self, staging, staged: List, brand_id: str, price_entries: List, stats: Dict):
+        """
+        Compare staged prices with the stored products inside MongoDB
+        Only products whose price changed come back, each queues a price_history entry
+        """
+        if not staged:
+            return
+
+        await staging.insert_many(staged, ordered=False)
+        changes = await staging.aggregate([
+            {'$lookup': {
+                'from': self.products.name,
+                'let': {'pid': '$product_id'},
+                'pipeline': [
+                    {'$match': {'brand_id': brand_id, '$expr': {'$eq': ['$product_id', '$$pid']}}},
+                    {'$project': {'_id': 0, 'price_min': 1}}
+                ],
+                'as': 'old'
+            }},
+            {'$unwind': '$old'},
+            {'$project': {
+                '_id': 0,
+                'product_id': 1,
+                'new_price': '$price_min',
+                'old_price': {'$ifNull': ['$old.price_min', 0]}
+            }},
+            {'$match': {'$expr': {'$and': [
+                {'$gt': ['$new_price', 0]},
+                {'$ne': ['$new_price', '$old_price']}
+            ]}}}
+        ])
+
+        async for change in changes:
+            product_id, new_price, old_price = change['product_id'], change['new_price'], change['old_price']
+            stats['price_changes'] += 1
+            price_entries.append(self._price_entry(product_id, brand_id, new_price, old_price))
+            log.info("Price change: %s/%s - PKR %s → PKR %s", brand_id, product_id,
+                     f"{old_price:,.0f}", f"{new_price:,.0f}")
+
+        await staging.delete_many({})
+        staged.clear()
+
+    async def _insert_many(self, collection, docs: List, stats: Dict) -> Set[int]:
+        """
+        Insert documents in one unordered insert_many, failed inserts are counted as errors
+        Returns the indexes (into docs) of the inserts that failed
+        """
+        if not docs:
+            return set()
+
+        try:
+            await collection.insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            write_errors = e.details.get('writeErrors', [])
+            print(f"    Insert into {collection.name}: {len(write_errors)} of {len(docs)} docs failed")
+            stats['errors'] += len(write_errors)
+            return {err['index'] for err in write_errors}
+
+        return set()
+
+    async def _flush_bulk(self, collection, ops: List, stats: Dict):
+        """
+        Send queued writes in one unordered bulk_write and clear the queue
+        Failed ops are counted as errors, the rest of the batch still applies
+        """
+        if not ops:
+            return
+
+        try:
+            await collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            write_errors = e.details.get('writeErrors', [])
+            print(f"    Bulk write: {len(write_errors)} of {len(ops)} ops failed")
+            stats['errors'] += len(write_errors)
+
+        ops.clear()
+
+    def _price_entry(self, product_id: str, brand_id: str, new_price: float, old_price: float = None) -> Dict:
+        """Build a price_history entry"""
+        return {
             'product_id': product_id,
             'brand_id': brand_id,
             'price': new_price,
@@ -425,13 +787,11 @@ class VastrDataSync:
             'change_detected': old_price is not None
         }
 
-        self.price_history.insert_one(price_entry)
-
-    def _update_brand_metadata(self, brand_id: str, stats: Dict):
+    async def _update_brand_metadata(self, brand_id: str, stats: Dict):
         """Update brand document"""
-        product_count = self.products.count_documents({'brand_id': brand_id})
+        product_count = await self.products.count_documents({'brand_id': brand_id})
 
-        self.brands.update_one(
+        await self.brands.update_one(
             {'brand_id': brand_id},
             {
                 '$set': {
@@ -447,33 +807,33 @@ class VastrDataSync:
             }
         )
 
-    def _log_sync(self, stats: Dict):
+    async def _log_sync(self, stats: Dict):
         """Log sync activity"""
-        self.sync_logs.insert_one(stats)
+        await self.sync_logs.insert_one(stats)
 
-    def get_last_sync_time(self, brand_id: str = None) -> datetime:
+    async def get_last_sync_time(self, brand_id: str = None) -> datetime:
         """Get last sync time for a brand or all brands"""
         if brand_id:
-            brand = self.brands.find_one({'brand_id': brand_id})
+            brand = await self.brands.find_one({'brand_id': brand_id})
             return brand.get('last_synced') if brand else None
         else:
             # Get oldest last_synced across all brands
-            brands = list(self.brands.find())
+            brands = await self.brands.find().to_list()
             sync_times = [b.get('last_synced') for b in brands if b.get('last_synced')]
             return min(sync_times) if sync_times else None
 
     def close(self):
-        """Close database connection"""
-        self.client.close()
+        """Nothing to release, each sync run closes its own client"""
+        pass
 
 
 # ============================================
 # SCHEDULER
 # ============================================
-def run_scheduled_sync():
+def run_scheduled_sync(full: bool = True):
     """Run scheduled data sync"""
     sync_manager = VastrDataSync()
-    sync_manager.sync_all_brands()
+    sync_manager.sync_all_brands(full=full)
     sync_manager.close()
 
 
@@ -481,21 +841,26 @@ def setup_scheduler():
     """Setup automatic sync schedule"""
     print(f" Scheduling automatic sync every {SYNC_INTERVAL_HOURS} hours")
 
-    # Schedule sync
-    schedule.every(SYNC_INTERVAL_HOURS).hours.do(run_scheduled_sync)
+    # Sleeps until the next fire time instead of polling; missed runs are
+    # coalesced into one and a job never overlaps itself
+    scheduler = BlockingScheduler(job_defaults={'coalesce': True, 'max_instances': 1})
+
+    # Schedule delta sync (only products edited since the last run)
+    scheduler.add_job(run_scheduled_sync, 'interval', hours=SYNC_INTERVAL_HOURS, kwargs={'full': False})
 
-    # Also schedule daily sync at 3 AM
-    schedule.every().day.at("03:00").do(run_scheduled_sync)
+    # Also schedule daily full sync at 3 AM, which also catches removed products
+    scheduler.add_job(run_scheduled_sync, 'cron', hour=3, minute=0, kwargs={'full': True})
 
     print(" Scheduler configured")
-    print(f"   - Every {SYNC_INTERVAL_HOURS} hours")
-    print(f"   - Daily at 3:00 AM")
+    print(f"   - Every {SYNC_INTERVAL_HOURS} hours (delta)")
+    print(f"   - Daily at 3:00 AM (full)")
 
     # Run scheduler
     print("\n Scheduler running... (Press Ctrl+C to stop)")
-    while True:
-        schedule.run_pending()
-        time.sleep(60)  # Check every minute
+    try:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        pass
 
 
 if __name__ == "__main__":
@@ -0,0 +1,210 @@
+import math
+import os
+import random
+import sys
+import unittest
+from collections import Counter
+
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hybrid_search import VastrHybridSearch, BM25_K1, BM25_B, BM25_EPSILON
+
+WORDS = [
+    'lawn', 'kurta', 'suit', 'embroidered', 'printed', 'cotton', 'silk', 'chiffon',
+    'black', 'white', 'red', 'blue', 'green', 'pink', 'floral', 'festive', 'eid',
+    'unstitched', 'stitched', 'shirt', 'trouser', 'dupatta', 'formal', 'casual'
+]
+BRANDS = [('nishat', 'Nishat Linen'), ('gulahmed', 'Gul Ahmed'), ('ethnic', 'Ethnic')]
+TYPES = ['Kurta', 'Unstitched', 'Trousers', 'Ready to Wear']
+
+
+def make_products(n, seed=0):
+    """Random products whose titles draw common words far more often than rare ones"""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(WORDS))]
+    products = []
+    for i in range(n):
+        brand_id, brand_name = rng.choice(BRANDS)
+        products.append({
+            'product_id': str(i),
+            'title': ' '.join(rng.choices(WORDS, weights, k=rng.randint(2, 8))),
+            'brand_id': brand_id,
+            'brand_name': brand_name,
+            'product_type': rng.choice(TYPES),
+            'price_min': rng.choice([None, 1500.0, 3000.0, 4500.0, 9000.0]),
+            'available': rng.random() < 0.7,
+        })
+        if products[-1]['price_min'] is None:
+            del products[-1]['price_min']
+    return products
+
+
+def make_engine(products):
+    """Search engine over an in-memory product list, skipping the MongoDB load"""
+    engine = VastrHybridSearch.__new__(VastrHybridSearch)
+    engine.products_list = products
+    engine.products_by_id = {p['product_id']: p for p in products}
+    engine.bm25_vocab = {}
+    engine.bm25_matrix = None
+    engine.bm25_max_scores = None
+    engine.tfidf_vectorizer = None
+    engine.tfidf_matrix = None
+    engine.product_texts = []
+    engine._build_search_indices()
+    return engine
+
+
+def reference_bm25(corpus, query_tokens):
+    """Textbook BM25Okapi scores of every document (the rank_bm25 formulation)"""
+    n_docs = len(corpus)
+    avgdl = sum(len(doc) for doc in corpus) / n_docs
+    df = Counter(term for doc in corpus for term in set(doc))
+    idf = {term: math.log(n_docs - n + 0.5) - math.log(n + 0.5) for term, n in df.items()}
+    floor = BM25_EPSILON * sum(idf.values()) / len(idf)
+    idf = {term: value if value >= 0 else floor for term, value in idf.items()}
+
+    scores = []
+    for doc in corpus:
+        tf = Counter(doc)
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * len(doc) / avgdl)
+        scores.append(sum(
+            idf[term] * tf[term] * (BM25_K1 + 1) / (tf[term] + norm)
+            for term in query_tokens if term in tf
+        ))
+    return np.array(scores)
+
+
+class BM25ScoringTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.products = make_products(400)
+        cls.engine = make_engine(cls.products)
+        cls.corpus = [text.split() for text in cls.engine.product_texts]
+        rng = random.Random(1)
+        cls.queries = [' '.join(rng.sample(WORDS, rng.randint(1, 4))) for _ in range(40)]
+        cls.queries += ['lawn lawn suit', 'unknownword', 'festive unknownword red']
+
+    def assert_matches_reference(self, results, expected, top_k):
+        """results hold the top_k reference scores, each at its own document"""
+        top_expected = np.sort(expected[expected > 0])[::-1][:top_k]
+        scores = np.array([score for _, score in results])
+        np.testing.assert_allclose(scores, top_expected, rtol=1e-4)
+        for idx, score in results:
+            self.assertAlmostEqual(score, expected[idx], delta=1e-4 * expected[idx])
+
+    def test_exhaustive_scores_match_reference(self):
+        n_docs = len(self.products)
+        for query in self.queries:
+            with self.subTest(query=query):
+                expected = reference_bm25(self.corpus, self.engine._preprocess_text(query).split())
+                results = self.engine._bm25_search(query, top_k=n_docs)
+                self.assert_matches_reference(results, expected, n_docs)
+
+    def test_maxscore_pruned_top_k_matches_reference(self):
+        for top_k in (1, 5, 20):
+            for query in self.queries:
+                with self.subTest(query=query, top_k=top_k):
+                    expected = reference_bm25(self.corpus, self.engine._preprocess_text(query).split())
+                    results = self.engine._bm25_search(query, top_k=top_k)
+                    self.assert_matches_reference(results, expected, top_k)
+
+    def test_filtered_search_only_ranks_matching_products(self):
+        filters = {'brand_id': 'nishat', 'available_only': True}
+        valid = self.engine._filter_mask(filters)
+        for query in self.queries:
+            with self.subTest(query=query):
+                expected = reference_bm25(self.corpus, self.engine._preprocess_text(query).split())
+                expected[~valid] = 0
+                results = self.engine._bm25_search(query, top_k=10, valid=valid)
+                self.assertTrue(all(valid[idx] for idx, _ in results))
+                self.assert_matches_reference(results, expected, 10)
+
+
+class SearchTotalsTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.products = make_products(400, seed=3)
+        cls.engine = make_engine(cls.products)
+        cls.corpus = [text.split() for text in cls.engine.product_texts]
+
+    def expected_total(self, query, filters):
+        """Products passing the filters that either search scores above zero"""
+        query_text = self.engine._preprocess_text(query)
+        bm25 = reference_bm25(self.corpus, query_text.split())
+        query_vec = self.engine.tfidf_vectorizer.transform([query_text])
+        cosine = cosine_similarity(query_vec, self.engine.tfidf_matrix).flatten()
+        matched = (bm25 > 0) | (cosine > 0)
+        valid = self.engine._filter_mask(filters)
+        if valid is not None:
+            matched &= valid
+        return int(matched.sum())
+
+    def test_total_counts_matches_beyond_top_k(self):
+        cases = [
+            ('lawn suit', {}),
+            ('lawn kurta', {'brand_id': 'nishat'}),
+            ('embroidered suit', {'available_only': True, 'max_price': 5000}),
+        ]
+        for query, filters in cases:
+            with self.subTest(query=query, filters=filters):
+                result = self.engine.search_with_insights(query, top_k=5, filters=filters)
+                self.assertEqual(len(result['products']), 5)
+                self.assertGreater(result['total_results'], 5)
+                self.assertEqual(result['total_results'], self.expected_total(query, filters))
+
+    def test_total_without_matches(self):
+        result = self.engine.search_with_insights('unknownword', top_k=5)
+        self.assertEqual(result['products'], [])
+        self.assertEqual(result['total_results'], 0)
+
+
+class FilterMaskTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.products = make_products(200, seed=2)
+        cls.engine = make_engine(cls.products)
+
+    def expected_mask(self, filters):
+        """The per-product checks the vectorized mask replaces"""
+        def keep(p):
+            if 'brand_id' in filters and p.get('brand_id') != filters['brand_id']:
+                return False
+            if 'min_price' in filters and p.get('price_min', 0) < filters['min_price']:
+                return False
+            if 'max_price' in filters and p.get('price_min', float('inf')) > filters['max_price']:
+                return False
+            if 'product_type' in filters and p.get('product_type') != filters['product_type']:
+                return False
+            if filters.get('available_only') and not p.get('available'):
+                return False
+            return True
+        return np.array([keep(p) for p in self.products])
+
+    def test_no_filters(self):
+        self.assertIsNone(self.engine._filter_mask({}))
+        self.assertIsNone(self.engine._filter_mask(None))
+
+    def test_filters_match_per_product_checks(self):
+        cases = [
+            {'brand_id': 'gulahmed'},
+            {'min_price': 3000},
+            {'max_price': 3000},
+            {'min_price': 1500, 'max_price': 4500},
+            {'product_type': 'Kurta'},
+            {'available_only': True},
+            {'available_only': False},
+            {'brand_id': 'ethnic', 'product_type': 'Unstitched', 'max_price': 5000, 'available_only': True},
+        ]
+        for filters in cases:
+            with self.subTest(filters=filters):
+                np.testing.assert_array_equal(self.engine._filter_mask(filters), self.expected_mask(filters))
+
+
+if __name__ == '__main__':
+    unittest.main()
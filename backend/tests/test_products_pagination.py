@@ -0,0 +1,105 @@
+import asyncio
+import json
+import os
+import random
+import sys
+import unittest
+from unittest import mock
+
+from fastapi import HTTPException
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+from routers import products
+
+
+def get_page(**params):
+    """Call the listing endpoint and decode its JSON body"""
+    args = dict(limit=20, page=1, cursor=None, brand=None, category=None,
+                price_min=None, price_max=None, sort=None)
+    args.update(params)
+    response = asyncio.run(products.get_products(**args))
+    return json.loads(response.body)
+
+
+@unittest.skipIf(mongomock is None, "mongomock is not installed")
+class CursorPaginationTest(unittest.TestCase):
+
+    def setUp(self):
+        rng = random.Random(0)
+        self.col = mongomock.MongoClient().vastr_fashion_db.products
+        docs = []
+        for i in range(157):
+            doc = {
+                'product_id': str(i),
+                'title': f'Product {i}',
+                'brand_name': rng.choice(['Nishat Linen', 'Gul Ahmed']),
+                'product_type': rng.choice(['Kurta', 'Unstitched']),
+            }
+            # Few distinct prices so ties fall back to _id, plus null and missing prices
+            price = rng.choice([None, 'missing', 1500, 3000, 4500])
+            if price != 'missing':
+                doc['price_min'] = price
+            docs.append(doc)
+        self.col.insert_many(docs)
+
+        patcher = mock.patch.object(products, 'products_col', self.col)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        products._cached_count.cache_clear()
+        self.addCleanup(products._cached_count.cache_clear)
+
+    def walk_cursor(self, **params):
+        seen, cursor = [], None
+        while True:
+            data = get_page(cursor=cursor, **params)
+            seen += [p['_id'] for p in data['products']]
+            cursor = data['next_cursor']
+            if not cursor:
+                return seen, data['total_products']
+
+    def walk_pages(self, **params):
+        seen, page = [], 1
+        while True:
+            data = get_page(page=page, **params)
+            if not data['products']:
+                return seen
+            seen += [p['_id'] for p in data['products']]
+            page += 1
+
+    def test_cursor_walk_matches_page_walk(self):
+        cases = [
+            {},
+            {'sort': 'price_asc'},
+            {'sort': 'price_desc'},
+            {'brand': ['Gul Ahmed'], 'sort': 'price_asc'},
+            {'category': ['Kurta'], 'price_min': 2000, 'sort': 'price_desc'},
+        ]
+        for params in cases:
+            with self.subTest(params=params):
+                by_cursor, total = self.walk_cursor(**params)
+                self.assertEqual(by_cursor, self.walk_pages(**params))
+                self.assertEqual(len(set(by_cursor)), len(by_cursor))
+                self.assertEqual(len(by_cursor), total)
+
+    def test_price_sort_includes_null_prices(self):
+        for sort in ('price_asc', 'price_desc'):
+            with self.subTest(sort=sort):
+                by_cursor, _ = self.walk_cursor(sort=sort)
+                self.assertEqual(len(by_cursor), self.col.count_documents({}))
+
+    def test_invalid_cursor(self):
+        for cursor in ('not-an-id', '0' * 24):
+            with self.subTest(cursor=cursor):
+                with self.assertRaises(HTTPException) as ctx:
+                    get_page(cursor=cursor, sort='price_asc')
+                self.assertEqual(ctx.exception.status_code, 400)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -2,15 +2,28 @@ from pymongo import MongoClient
 from pprint import pprint
 
 # Connect to MongoDB
-client = MongoClient("mongodb://localhost:27017/")
+client = MongoClient(
+    "mongodb://localhost:27017/",
+    maxPoolSize=50,
+    minPoolSize=5,
+    maxIdleTimeMS=300000,
+    compressors="zstd,zlib",
+    retryWrites=True
+)
 db = client["vastr_fashion_db"]
 products = db["products"]
 
+OUTLIER_QUERY = {"price_min": {"$lt": 100}}
+SAMPLE_PROJECTION = {"product_id": 1, "brand_id": 1, "title": 1, "price_min": 1}
+
+# Lets the counts below run on the index alone
+products.create_index([("price_min", 1)])
+
 # Find outliers
 print("🔍 Finding products with price_min < 100...")
-outliers = list(products.find({"price_min": {"$lt": 100}}))
-print(f"Found {len(outliers)} products:")
-for product in outliers[:5]:  # Show first 5
+found = products.count_documents(OUTLIER_QUERY)
+print(f"Found {found} products:")
+for product in products.find(OUTLIER_QUERY, projection=SAMPLE_PROJECTION).limit(5):  # Show first 5
     pprint({
         "product_id": product["product_id"],
         "brand_id": product["brand_id"],
@@ -21,18 +34,18 @@ for product in outliers[:5]:  # Show first 5
 # Fix prices (multiply by 100)
 print("\n🔧 Updating prices...")
 result = products.update_many(
-    {"price_min": {"$lt": 100}},
+    OUTLIER_QUERY,
     [{"$set": {"price_min": {"$multiply": ["$price_min", 100]}, "price_max": {"$multiply": ["$price_max", 100]}}}]
 )
 print(f"Updated {result.modified_count} products")
 
 # Verify
 print("\n🔍 Verifying...")
-outliers_after = list(products.find({"price_min": {"$lt": 100}}))
-print(f"Remaining outliers: {len(outliers_after)}")
-if outliers_after:
+remaining = products.count_documents(OUTLIER_QUERY)
+print(f"Remaining outliers: {remaining}")
+if remaining:
     print("Remaining outliers:")
-    for product in outliers_after[:5]:
+    for product in products.find(OUTLIER_QUERY, projection=SAMPLE_PROJECTION).limit(5):
         pprint({
             "product_id": product["product_id"],
             "brand_id": product["brand_id"],
@@ -1,10 +1,26 @@
-from pymongo import MongoClient
 import pandas as pd
+import numpy as np
 import json
+import math
+import re
 from datetime import datetime
 import os
+from types import MappingProxyType
+from db import get_client
+
+try:
+    from numba import njit
+except ImportError:  # numba is optional - fall back to the plain Python loop
+    def njit(*args, **kwargs):
+        def decorator(func):
+            return func
+        return decorator
+
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional - fall back to per-keyword substring checks
+    ahocorasick = None
 
-MONGO_URI = "mongodb://localhost:27017/"
 DATABASE_NAME = "vastr_fashion_db"
 OUTPUT_DIR = "../reports"
 
@@ -18,91 +34,197 @@ BRAND_FILES = {
     'limelight': 'Limelight'
 }
 
+# Only the fields the analysis reads are pulled from MongoDB
+ANALYSIS_PROJECTION = {
+    'product_id': 1, 'title': 1, 'price_min': 1, 'price_max': 1, 'brand_id': 1,
+    'product_type': 1, 'available': 1, 'tags': 1, 'images': 1, 'url': 1, '_id': 0
+}
+
+# Direct mappings for known product_type values
+_CATEGORY_MAPPING = MappingProxyType({
+    'pack suit': 'Unstitched',
+    'suit': 'Unstitched',
+    'lawn suit': 'Unstitched',
+    'embroidered suit': 'Unstitched',
+    'unstitched': 'Unstitched',
+    'unstitched printed': 'Unstitched',
+    'unstitched embroidered': 'Unstitched',
+    'unstitched embroidery': 'Unstitched',
+    'unstitched lawn': 'Unstitched',
+    'unstitched mbroidered': 'Unstitched',
+    'unstitched printed-2': 'Unstitched',
+    'unstitched trouser': 'Trousers',
+    'unstitched trouser-1': 'Trousers',
+    'unstitched (medium emb)-1': 'Unstitched',
+    'unstitched emb-old': 'Unstitched',
+    'unstitched-rozana': 'Unstitched',
+    'pret': 'Ready-to-Wear',
+    'ready to wear': 'Ready-to-Wear',
+    'rtw': 'Ready-to-Wear',
+    'ready to wear-old': 'Ready-to-Wear',
+    'exclusive pret': 'Ready-to-Wear',
+    'luxury pret': 'Ready-to-Wear',
+    'basic pret': 'Ready-to-Wear',
+    'wedding pret': 'Ready-to-Wear',
+    'kurta': 'Kurta',
+    'kurtas': 'Kurta',
+    'basic suits': 'Unstitched',
+    'exclusive suits': 'Unstitched',
+    'luxury suits': 'Unstitched',
+    'men suit': 'Menswear',
+    'women': 'Unstitched',  # Assume women with lawn/suit context
+    'women fabric': 'Unstitched',
+    'silk pants': 'Trousers',
+    'exclusive pants': 'Trousers',
+    'basic pants': 'Trousers',
+    'trousers': 'Trousers',
+    'trousers-old': 'Trousers',
+    'bottoms': 'Trousers',
+    'bottom': 'Trousers',
+    'western': 'Western',
+    'western-1': 'Western',
+    'western-old': 'Western',
+    'co-ords': 'Western',
+    'eastern top': 'Kurta',
+    'eastern top-2': 'Kurta',
+    'tops': 'Western',
+    'luxury formals': 'Ready-to-Wear',
+    'rozana': 'Ready-to-Wear',
+    'casual': 'Ready-to-Wear',
+    'studio': 'Ready-to-Wear',
+    'fusion': 'Ready-to-Wear',
+    'winter': 'Ready-to-Wear',
+    'winters': 'Ready-to-Wear',
+    'shawls': 'Others',
+    'loungewear': 'Others',
+    'knit': 'Ready-to-Wear',
+    'meter': 'Unstitched'
+})
+
+# Title/tag keywords per category, in priority order
+_CATEGORY_KEYWORDS = (
+    ('Unstitched', frozenset(['unstitched', 'lawn', 'suit', 'piece', 'fabric'])),
+    ('Ready-to-Wear', frozenset(['pret', 'rtw', 'stitched', 'ready to wear', 'luxury pret', 'casual'])),
+    ('Kurta', frozenset(['kurta', 'kurtas'])),
+    ('Trousers', frozenset(['pant', 'trouser', 'bottom', 'pants'])),
+    ('Western', frozenset(['western', 'co-ord', 'top', 'tops'])),
+    ('Menswear', frozenset(['men', 'menswear'])),
+)
+_CATEGORY_PRIORITY = {category: rank for rank, (category, _) in enumerate(_CATEGORY_KEYWORDS)}
+
+
+def _build_keyword_automaton():
+    """Aho-Corasick automaton mapping each keyword to the best category it belongs to"""
+    automaton = ahocorasick.Automaton()
+    for category, keywords in reversed(_CATEGORY_KEYWORDS):
+        for keyword in keywords:
+            automaton.add_word(keyword, category)
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton() if ahocorasick else None
+
+
+def _match_keywords(title, tag_set):
+    """Highest-priority category whose keywords appear in the title or as a tag"""
+    best = len(_CATEGORY_KEYWORDS)
+
+    # Tags must match a keyword exactly
+    for rank, (_, keywords) in enumerate(_CATEGORY_KEYWORDS):
+        if not keywords.isdisjoint(tag_set):
+            best = rank
+            break
+
+    # Title matches any keyword as a substring, found in one pass over the title
+    if _KEYWORD_AUTOMATON is not None:
+        for _, category in _KEYWORD_AUTOMATON.iter(title):
+            best = min(best, _CATEGORY_PRIORITY[category])
+            if best == 0:
+                break
+    else:
+        for rank, (_, keywords) in enumerate(_CATEGORY_KEYWORDS[:best]):
+            if any(keyword in title for keyword in keywords):
+                best = rank
+                break
+
+    return _CATEGORY_KEYWORDS[best][0] if best < len(_CATEGORY_KEYWORDS) else 'Others'
+
+
 # Category mapping function using product_type, title, and tags
 def map_category(ptype, title, tags):
     ptype = ptype.lower().strip() if isinstance(ptype, str) else 'unknown'
     title = title.lower() if isinstance(title, str) else ''
-    tags = [t.lower() for t in tags] if isinstance(tags, list) else []
-
-    # Direct mappings for known product_type values
-    CATEGORY_MAPPING = {
-        'pack suit': 'Unstitched',
-        'suit': 'Unstitched',
-        'lawn suit': 'Unstitched',
-        'embroidered suit': 'Unstitched',
-        'unstitched': 'Unstitched',
-        'unstitched printed': 'Unstitched',
-        'unstitched embroidered': 'Unstitched',
-        'unstitched embroidery': 'Unstitched',
-        'unstitched lawn': 'Unstitched',
-        'unstitched mbroidered': 'Unstitched',
-        'unstitched printed-2': 'Unstitched',
-        'unstitched trouser': 'Trousers',
-        'unstitched trouser-1': 'Trousers',
-        'unstitched (medium emb)-1': 'Unstitched',
-        'unstitched emb-old': 'Unstitched',
-        'unstitched-rozana': 'Unstitched',
-        'pret': 'Ready-to-Wear',
-        'ready to wear': 'Ready-to-Wear',
-        'rtw': 'Ready-to-Wear',
-        'ready to wear-old': 'Ready-to-Wear',
-        'exclusive pret': 'Ready-to-Wear',
-        'luxury pret': 'Ready-to-Wear',
-        'basic pret': 'Ready-to-Wear',
-        'wedding pret': 'Ready-to-Wear',
-        'kurta': 'Kurta',
-        'kurtas': 'Kurta',
-        'basic suits': 'Unstitched',
-        'exclusive suits': 'Unstitched',
-        'luxury suits': 'Unstitched',
-        'men suit': 'Menswear',
-        'women': 'Unstitched',  # Assume women with lawn/suit context
-        'women fabric': 'Unstitched',
-        'silk pants': 'Trousers',
-        'exclusive pants': 'Trousers',
-        'basic pants': 'Trousers',
-        'trousers': 'Trousers',
-        'trousers-old': 'Trousers',
-        'bottoms': 'Trousers',
-        'bottom': 'Trousers',
-        'western': 'Western',
-        'western-1': 'Western',
-        'western-old': 'Western',
-        'co-ords': 'Western',
-        'eastern top': 'Kurta',
-        'eastern top-2': 'Kurta',
-        'tops': 'Western',
-        'luxury formals': 'Ready-to-Wear',
-        'rozana': 'Ready-to-Wear',
-        'casual': 'Ready-to-Wear',
-        'studio': 'Ready-to-Wear',
-        'fusion': 'Ready-to-Wear',
-        'winter': 'Ready-to-Wear',
-        'winters': 'Ready-to-Wear',
-        'shawls': 'Others',
-        'loungewear': 'Others',
-        'knit': 'Ready-to-Wear',
-        'meter': 'Unstitched'
-    }
+    tag_set = {t.lower() for t in tags} if isinstance(tags, list) else set()
 
     # Direct mapping if product_type is known
-    if ptype in CATEGORY_MAPPING:
-        return CATEGORY_MAPPING[ptype]
+    if ptype in _CATEGORY_MAPPING:
+        return _CATEGORY_MAPPING[ptype]
 
     # Dynamic mapping based on title and tags
-    if any(keyword in title or keyword in tags for keyword in ['unstitched', 'lawn', 'suit', 'piece', 'fabric']):
-        return 'Unstitched'
-    if any(keyword in title or keyword in tags for keyword in ['pret', 'rtw', 'stitched', 'ready to wear', 'luxury pret', 'casual']):
-        return 'Ready-to-Wear'
-    if any(keyword in title or keyword in tags for keyword in ['kurta', 'kurtas']):
-        return 'Kurta'
-    if any(keyword in title or keyword in tags for keyword in ['pant', 'trouser', 'bottom', 'pants']):
-        return 'Trousers'
-    if any(keyword in title or keyword in tags for keyword in ['western', 'co-ord', 'top', 'tops']):
-        return 'Western'
-    if any(keyword in title or keyword in tags for keyword in ['men', 'menswear']):
-        return 'Menswear'
-    return 'Others'
+    return _match_keywords(title, tag_set)
+
+
+# Separator used when joining a product's tags into one string for vectorized matching
+_TAG_SEP = '\n'
+
+# Per-category regexes: any keyword as a title substring, or a whole tag
+_TITLE_PATTERNS = tuple(
+    '|'.join(re.escape(k) for k in sorted(keywords)) for _, keywords in _CATEGORY_KEYWORDS
+)
+_TAG_PATTERNS = tuple(f'(?:^|{_TAG_SEP})(?:{pattern})(?:{_TAG_SEP}|$)' for pattern in _TITLE_PATTERNS)
+
+
+def join_tags(tags):
+    """Join list-valued tags into one separator-delimited string per product"""
+    return tags.map(lambda t: _TAG_SEP.join(t) if isinstance(t, list) else '')
+
+
+def map_category_vec(product_types, titles, tags):
+    """Vectorized map_category over whole columns; tags are pre-joined with join_tags"""
+    mapped = product_types.str.lower().str.strip().map(_CATEGORY_MAPPING).astype(object)
+
+    # Only products without a direct product_type mapping need keyword matching
+    unmapped = mapped.isna()
+    titles = titles[unmapped].str.lower().fillna('')
+    tags = tags[unmapped].str.lower().fillna('')
+
+    # np.select takes the first true condition, preserving keyword priority
+    condlist, choicelist = [], []
+    for (category, _), title_pattern, tag_pattern in zip(_CATEGORY_KEYWORDS, _TITLE_PATTERNS, _TAG_PATTERNS):
+        condlist.append((titles.str.contains(title_pattern, regex=True, na=False)
+                         | tags.str.contains(tag_pattern, regex=True, na=False)).to_numpy())
+        choicelist.append(category)
+
+    mapped[unmapped] = np.select(condlist, choicelist, default='Others')
+    return mapped
+
+# Price ranges are right-closed: (0, 2000], (2000, 5000], ... , (20000, inf)
+PRICE_RANGE_EDGES = np.array([2000, 5000, 10000, 20000], dtype=np.float64)
+PRICE_RANGE_LABELS = ('Budget (<2K)', 'Affordable (2K-5K)', 'Mid-range (5K-10K)', 'Premium (10K-20K)', 'Luxury (>20K)')
+
+
+@njit(cache=True)
+def _bin_prices(prices, edges, out):
+    """Write the price range index of each (positive) price into out"""
+    for i in range(prices.size):
+        v = prices[i]
+        j = 0
+        while j < edges.size and v > edges[j]:
+            j += 1
+        out[i] = j
+
+
+def _float_or_none(value):
+    """Plain float for the JSON report, with NaN written as null"""
+    return None if math.isnan(value) else float(value)
+
+
+def _fast_default(obj):
+    """json.dump fallback for numpy scalars such as value_counts() and sum() results"""
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
 
 # ============================================
 # DATABASE CONNECTION AND ANALYSIS
@@ -111,7 +233,7 @@ class DataAnalyzer:
     """Analyze Vastr fashion data"""
 
     def __init__(self):
-        self.client = MongoClient(MONGO_URI)
+        self.client = get_client()
         self.db = self.client[DATABASE_NAME]
         self.products = self.db['products']
         self.brands = self.db['brands']
@@ -119,26 +241,33 @@ class DataAnalyzer:
 
     def get_all_products_df(self):
         """Load all products into pandas DataFrame"""
-        products = list(self.products.find())
-        if not products:
+        cursor = self.products.find({}, projection=ANALYSIS_PROJECTION).batch_size(2000)
+        df = pd.DataFrame.from_records(cursor)
+        if df.empty:
             print(" No products found in database!")
             return None
-        df = pd.DataFrame(products)
         print(f" Loaded {len(df)} products")
 
-        # Map brand_id to brand_name
+        # Map brand_id to brand_name, as a categorical so brand groupbys work on integer codes
         if 'brand_id' in df.columns:
-            df['brand_name'] = df['brand_id'].map(BRAND_FILES).fillna(df['brand_id'])
+            df['brand_name'] = pd.Categorical(df['brand_id'].map(BRAND_FILES).fillna(df['brand_id']))
+
+        # Image counts are used by several reports - compute them once
+        if 'images' in df.columns:
+            df['_images_len'] = [len(x) if isinstance(x, list) else 0 for x in df['images'].to_numpy()]
+        else:
+            df['_images_len'] = 0
+
+        # Only positive prices count towards per-brand price stats
+        if 'price_min' in df.columns:
+            df['_price'] = df['price_min'].where(df['price_min'] > 0)
 
         # Standardize product_type using title and tags
         if 'product_type' in df.columns:
-            df['product_type'] = df.apply(
-                lambda row: map_category(
-                    row['product_type'],
-                    row.get('title', ''),
-                    row.get('tags', [])
-                ), axis=1
-            )
+            empty = pd.Series('', index=df.index)
+            titles = df['title'] if 'title' in df.columns else empty
+            tags_joined = join_tags(df['tags']) if 'tags' in df.columns else empty
+            df['product_type'] = map_category_vec(df['product_type'], titles, tags_joined)
         return df
 
     def data_quality_report(self, df):
@@ -148,38 +277,36 @@ class DataAnalyzer:
         print("=" * 60)
 
         print("\n Missing Data Analysis:")
-        missing = df.isnull().sum()
         total = len(df)
         key_fields = ['title', 'price_min', 'brand_id', 'product_type', 'available', 'images']
-        for field in key_fields:
-            if field in df.columns:
-                missing_count = df[field].isnull().sum()
-                missing_pct = (missing_count / total) * 100
-                print(f"   {field}: {missing_count} missing ({missing_pct:.1f}%)")
+        missing_all = df[[field for field in key_fields if field in df.columns]].isnull().sum()
+        for field, missing_count in missing_all.items():
+            missing_pct = (missing_count / total) * 100
+            print(f"   {field}: {missing_count} missing ({missing_pct:.1f}%)")
 
         print("\n🔍 Data Consistency:")
         if 'price_min' in df.columns:
             print(f"   Products with price_min: {df['price_min'].notna().sum()} ({(df['price_min'].notna().sum() / total) * 100:.1f}%)")
-        print(f"   Products with images: {df['images'].apply(lambda x: len(x) > 0 if isinstance(x, list) else False).sum()}")
+        print(f"   Products with images: {(df['_images_len'] > 0).sum()}")
         print(f"   Available products: {df['available'].sum() if 'available' in df else 'N/A'}")
         if 'product_id' in df.columns:
-            duplicates = df.duplicated(subset=['product_id']).sum()
+            duplicates = df['product_id'].duplicated().sum()
             print(f"   Duplicate product IDs: {duplicates}")
 
         return {
             'total_products': total,
             'missing_prices': df['price_min'].isnull().sum() if 'price_min' in df.columns else 0,
-            'missing_images': df['images'].apply(lambda x: len(x) == 0 if isinstance(x, list) else True).sum()
+            'missing_images': (df['_images_len'] == 0).sum()
         }
 
-    def price_analysis(self, df):
+    def price_analysis(self, df, brand_groups):
         """Analyze pricing across brands"""
         print("\n" + "=" * 60)
         print("PRICE ANALYSIS")
         print("=" * 60)
 
         price_col = 'price_min'
-        df_with_price = df[df[price_col].notna() & (df[price_col] > 0)].copy()
+        df_with_price = df[df[price_col].notna() & (df[price_col] > 0)]
 
         print(f"\n💰 Overall Price Statistics:")
         print(f"   Total products with prices: {len(df_with_price)}")
@@ -189,8 +316,8 @@ class DataAnalyzer:
         print(f"   Max price: PKR {df_with_price[price_col].max():,.2f}")
 
         print(f"\n🏪 Average Price by Brand:")
-        brand_prices = df_with_price.groupby('brand_name')[price_col].agg(['mean', 'median', 'min', 'max', 'count'])
-        brand_prices = brand_prices.sort_values('mean', ascending=False)
+        brand_prices = brand_groups['_price'].agg(['mean', 'median', 'min', 'max', 'count'])
+        brand_prices = brand_prices[brand_prices['count'] > 0].sort_values('mean', ascending=False)
 
         for brand, row in brand_prices.iterrows():
             print(f"\n   {brand}:")
@@ -200,17 +327,16 @@ class DataAnalyzer:
             print(f"      Range: PKR {row['min']:,.2f} - PKR {row['max']:,.2f}")
 
         print(f"\n📊 Price Distribution:")
-        bins = [0, 2000, 5000, 10000, 20000, float('inf')]
-        labels = ['Budget (<2K)', 'Affordable (2K-5K)', 'Mid-range (5K-10K)', 'Premium (10K-20K)', 'Luxury (>20K)']
-        df_with_price['price_range'] = pd.cut(df_with_price[price_col], bins=bins, labels=labels)
-        price_dist = df_with_price['price_range'].value_counts().sort_index()
-        for range_name, count in price_dist.items():
+        codes = np.empty(len(df_with_price), dtype=np.int8)
+        _bin_prices(df_with_price[price_col].to_numpy(np.float64), PRICE_RANGE_EDGES, codes)
+        price_dist = np.bincount(codes, minlength=len(PRICE_RANGE_LABELS))
+        for range_name, count in zip(PRICE_RANGE_LABELS, price_dist):
             pct = (count / len(df_with_price)) * 100
             print(f"   {range_name}: {count} products ({pct:.1f}%)")
 
         return brand_prices
 
-    def category_analysis(self, df):
+    def category_analysis(self, df, brand_counts):
         """Analyze product categories"""
         print("\n" + "=" * 60)
         print("CATEGORY ANALYSIS")
@@ -224,42 +350,61 @@ class DataAnalyzer:
                 print(f"   {cat}: {count} products ({pct:.1f}%)")
 
             print(f"\n🏪 Categories per Brand:")
-            for brand in df['brand_name'].unique():
-                brand_df = df[df['brand_name'] == brand]
-                unique_cats = brand_df['product_type'].nunique()
-                print(f"   {brand}: {unique_cats} unique categories")
-                if unique_cats > 0:
-                    brand_cats = brand_df['product_type'].value_counts()
-                    for cat, count in brand_cats.items():
-                        print(f"      {cat}: {count} products")
+            # Brand x category counts in one pass
+            cat_matrix = pd.crosstab(df['brand_name'], df['product_type'])
+            # Each brand's categories in first-seen order, so tied counts keep
+            # the order value_counts gives them
+            first_seen = df[['brand_name', 'product_type']].dropna().drop_duplicates()
+            cat_order = first_seen.groupby('brand_name', sort=False, observed=True)['product_type'].agg(list)
+            # Brands in first-seen order (brand_counts comes from an unsorted groupby)
+            brand_categories = {}
+            for brand in brand_counts.index:
+                cats = cat_order.get(brand, [])
+                row = cat_matrix.loc[brand, cats] if cats else pd.Series(dtype='int64')
+                brand_categories[brand] = row.sort_values(ascending=False, kind='stable')
+
+            for brand, brand_cats in brand_categories.items():
+                print(f"   {brand}: {len(brand_cats)} unique categories")
+                for cat, count in brand_cats.items():
+                    print(f"      {cat}: {count} products")
 
             unique_types = sorted(df['product_type'].unique())
             print(f"\n🔍 All Unique Product Types ({len(unique_types)}):")
             print(f"   {unique_types}")
+            return brand_categories
         else:
             print("\n⚠️ No product_type field found in data")
+            return None
 
-    def brand_comparison(self, df):
+    def get_brand_stats(self):
+        """Per-brand product, price, availability and image stats, aggregated by MongoDB"""
+        image_count = {'$cond': [{'$isArray': '$images'}, {'$size': '$images'}, 0]}
+        pipeline = [
+            {'$project': {'brand_id': 1, 'price_min': 1, 'available': 1, 'image_count': image_count}},
+            {'$group': {
+                '_id': '$brand_id',
+                'total_products': {'$sum': 1},
+                'avg_price': {'$avg': '$price_min'},
+                'available_products': {'$sum': {'$cond': ['$available', 1, 0]}},
+                'products_with_images': {'$sum': {'$cond': [{'$gt': ['$image_count', 0]}, 1, 0]}},
+                'avg_images_per_product': {'$avg': '$image_count'}
+            }},
+            # $avg is null for a brand without prices - report 0 rather than null/NaN
+            {'$addFields': {'avg_price': {'$ifNull': ['$avg_price', 0]}}}
+        ]
+        stats = pd.DataFrame(list(self.products.aggregate(pipeline)))
+        if stats.empty:
+            return stats
+        stats.insert(0, 'brand', stats.pop('_id').map(lambda b: BRAND_FILES.get(b, b)))
+        return stats
+
+    def brand_comparison(self):
         """Compare brands"""
         print("\n" + "=" * 60)
         print("BRAND COMPARISON")
         print("=" * 60)
 
-        price_col = 'price_min'
-        brand_stats = []
-        for brand in df['brand_name'].unique():
-            brand_df = df[df['brand_name'] == brand]
-            stats = {
-                'brand': brand,
-                'total_products': len(brand_df),
-                'avg_price': brand_df[price_col].mean() if price_col in brand_df else 0,
-                'available_products': brand_df['available'].sum() if 'available' in brand_df else 0,
-                'products_with_images': brand_df['images'].apply(
-                    lambda x: len(x) > 0 if isinstance(x, list) else False).sum(),
-                'avg_images_per_product': brand_df['images'].apply(
-                    lambda x: len(x) if isinstance(x, list) else 0).mean()
-            }
-            brand_stats.append(stats)
+        brand_stats = self.get_brand_stats().to_dict('records')
 
         brand_stats.sort(key=lambda x: x['total_products'], reverse=True)
         print(f"\n🏆 Brand Rankings:")
@@ -273,7 +418,7 @@ class DataAnalyzer:
 
         return brand_stats
 
-    def generate_insights(self, df):
+    def generate_insights(self, df, brand_groups, brand_counts):
         """Generate key insights"""
         print("\n" + "=" * 60)
         print("KEY INSIGHTS & RECOMMENDATIONS")
@@ -281,18 +426,18 @@ class DataAnalyzer:
 
         insights = []
         price_col = 'price_min'
-        brand_avg_prices = df.groupby('brand_name')[price_col].mean().sort_values(ascending=False)
+        brand_avg_prices = brand_groups[price_col].mean().sort_values(ascending=False)
         most_expensive = brand_avg_prices.index[0]
         insights.append(
             f"🔹 {most_expensive} is the most premium brand (Avg: PKR {brand_avg_prices[most_expensive]:,.2f})")
         most_affordable = brand_avg_prices.index[-1]
         insights.append(
             f"🔹 {most_affordable} offers most affordable options (Avg: PKR {brand_avg_prices[most_affordable]:,.2f})")
-        brand_counts = df['brand_name'].value_counts()
+        brand_counts = brand_counts.sort_values(ascending=False)
         largest_inventory = brand_counts.index[0]
         insights.append(
             f"🔹 {largest_inventory} has the largest collection ({brand_counts[largest_inventory]} products)")
-        mid_range_count = df[(df[price_col] >= 5000) & (df[price_col] <= 10000)].shape[0]
+        mid_range_count = int(((df[price_col] >= 5000) & (df[price_col] <= 10000)).sum())
         mid_range_pct = (mid_range_count / len(df)) * 100
         insights.append(f"🔹 {mid_range_pct:.1f}% of products are in mid-range (5K-10K PKR)")
         if 'product_type' in df.columns:
@@ -307,7 +452,7 @@ class DataAnalyzer:
 
         return insights
 
-    def export_analysis(self, df, brand_prices, brand_stats, insights):
+    def export_analysis(self, df, brand_counts, brand_categories, brand_prices, brand_stats, insights):
         """Export analysis results"""
         print("\n" + "=" * 60)
         print("EXPORTING ANALYSIS")
@@ -315,38 +460,28 @@ class DataAnalyzer:
 
         os.makedirs(OUTPUT_DIR, exist_ok=True)
 
-        def convert_types(obj):
-            if isinstance(obj, dict):
-                return {k: convert_types(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [convert_types(item) for item in obj]
-            elif hasattr(obj, 'item'):
-                return obj.item()
-            elif pd.isna(obj):
-                return None
-            return obj
-
+        prices = df['price_min'] if 'price_min' in df else None
         report = {
             'generated_at': datetime.now().isoformat(),
             'total_products': int(len(df)),
-            'total_brands': int(df['brand_name'].nunique()),
+            'total_brands': len(brand_counts),
             'price_statistics': {
-                'average': convert_types(df['price_min'].mean()) if 'price_min' in df else 0,
-                'median': convert_types(df['price_min'].median()) if 'price_min' in df else 0,
-                'min': convert_types(df['price_min'].min()) if 'price_min' in df else 0,
-                'max': convert_types(df['price_min'].max()) if 'price_min' in df else 0
+                'average': _float_or_none(prices.mean()) if prices is not None else 0,
+                'median': _float_or_none(prices.median()) if prices is not None else 0,
+                'min': _float_or_none(prices.min()) if prices is not None else 0,
+                'max': _float_or_none(prices.max()) if prices is not None else 0
             },
-            'category_statistics': convert_types({
-                brand: dict(df[df['brand_name'] == brand]['product_type'].value_counts())
-                for brand in df['brand_name'].unique()
-            }) if 'product_type' in df.columns else {},
-            'brand_prices': convert_types(brand_prices.to_dict()) if brand_prices is not None else {},
-            'brand_stats': convert_types(brand_stats),
+            'category_statistics': {
+                brand: {cat: int(count) for cat, count in brand_cats.items()}
+                for brand, brand_cats in brand_categories.items()
+            } if brand_categories is not None else {},
+            'brand_prices': brand_prices.to_dict() if brand_prices is not None else {},
+            'brand_stats': brand_stats,
             'insights': insights
         }
 
         with open(f'{OUTPUT_DIR}/analysis_summary.json', 'w') as f:
-            json.dump(report, f, indent=2)
+            json.dump(report, f, indent=2, default=_fast_default)
         print(f"✅ Saved: {OUTPUT_DIR}/analysis_summary.json")
 
         export_cols = ['brand_name', 'title', 'price_min', 'product_type', 'available', 'url']
@@ -360,8 +495,8 @@ class DataAnalyzer:
             print(f"✅ Saved: {OUTPUT_DIR}/brand_price_comparison.csv")
 
     def close(self):
-        """Close database connection"""
-        self.client.close()
+        """The shared client is closed at exit"""
+        pass
 
 if __name__ == "__main__":
 
@@ -374,11 +509,14 @@ if __name__ == "__main__":
         exit(1)
 
     quality_report = analyzer.data_quality_report(df)
-    brand_prices = analyzer.price_analysis(df)
-    analyzer.category_analysis(df)
-    brand_stats = analyzer.brand_comparison(df)
-    insights = analyzer.generate_insights(df)
-    analyzer.export_analysis(df, brand_prices, brand_stats, insights)
+    # Group by brand once and share it across the reports, in order of first appearance
+    brand_groups = df.groupby('brand_name', sort=False, observed=True)
+    brand_counts = brand_groups.size()
+    brand_prices = analyzer.price_analysis(df, brand_groups)
+    brand_categories = analyzer.category_analysis(df, brand_counts)
+    brand_stats = analyzer.brand_comparison()
+    insights = analyzer.generate_insights(df, brand_groups, brand_counts)
+    analyzer.export_analysis(df, brand_counts, brand_categories, brand_prices, brand_stats, insights)
     analyzer.close()
 
     print("\n" + "=" * 60)
@@ -0,0 +1,25 @@
+# db.py - shared MongoDB client for the info/ scripts
+from pymongo import MongoClient
+import atexit
+
+MONGO_URI = "mongodb://localhost:27017/"
+
+# One pooled, wire-compressed client per URI (will be created once)
+_clients = {}
+
+
+def get_client(uri=MONGO_URI):
+    """Returns the shared MongoClient for uri, closed at interpreter exit"""
+    client = _clients.get(uri)
+    if client is None:
+        client = MongoClient(
+            uri,
+            maxPoolSize=50,
+            minPoolSize=5,
+            maxIdleTimeMS=300000,
+            compressors='zstd,zlib',
+            retryWrites=True
+        )
+        atexit.register(client.close)
+        _clients[uri] = client
+    return client
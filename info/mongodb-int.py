@@ -1,8 +1,16 @@
-from pymongo import MongoClient
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, OperationFailure
 from datetime import datetime
-import json
+import orjson
 import os
 import glob
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from db import get_client
+
+try:
+    import ijson
+except ImportError:  # ijson is optional - fall back to loading the whole file
+    ijson = None
 
 # ============================================
 # CONFIGURATION
@@ -12,6 +20,12 @@ import glob
 MONGO_URI = "mongodb://localhost:27017/"
 DATABASE_NAME = "vastr_fashion_db"
 
+# Upserts sent per bulk_write
+BULK_BATCH_SIZE = 1000
+
+# Brands imported at the same time
+IMPORT_WORKERS = 4
+
 # Data directory
 DATA_DIR = "../data"
 
@@ -36,32 +50,73 @@ class VastrDatabase:
 
     def __init__(self, connection_string=MONGO_URI, db_name=DATABASE_NAME):
         try:
-            self.client = MongoClient(connection_string)
+            self.client = get_client(connection_string)
             self.db = self.client[db_name]
             self.products = self.db['products']
             self.brands = self.db['brands']
             self.price_history = self.db['price_history']
             self.scrape_logs = self.db['scrape_logs']
+            self._ensure_indexes()
             print(f"✅ Connected to MongoDB: {db_name}")
         except Exception as e:
             print(f"❌ Failed to connect to MongoDB: {e}")
             exit(1)
 
-    def insert_products_bulk(self, products_list, brand_id, brand_name):
-        """Insert multiple products at once"""
-        inserted = 0
-        updated = 0
-        errors = 0
+    def _ensure_indexes(self):
+        """Create the indexes used by import upserts and analysis (no-op if they already exist)"""
+        product_key = [('brand_id', 1), ('product_id', 1)]
+
+        # A non-unique fallback from an earlier run counts, retrying unique would just conflict
+        if not any(info['key'] == product_key for info in self.products.index_information().values()):
+            try:
+                self.products.create_index(product_key, unique=True)
+            except OperationFailure as e:
+                # Existing duplicates block a unique index, still index the lookups
+                print(f"   ⚠️ Unique product index not created ({e}), using non-unique")
+                self.products.create_index(product_key)
+
+        self.products.create_index([('price_min', 1)])
+        self.price_history.create_index([('product_id', 1), ('date', -1)])
+
+    def insert_products_bulk(self, products, brand_id, brand_name, log=print):
+        """Insert products from a list or a streaming parser, one batch at a time"""
+        counts = {'inserted': 0, 'updated': 0, 'errors': 0}
+        total = 0
+        batch = []
+
+        for product in products:
+            batch.append(product)
+            total += 1
+            if len(batch) >= BULK_BATCH_SIZE:
+                self.insert_products_batch(batch, brand_id, brand_name, counts, log)
+                batch = []
+
+        self.insert_products_batch(batch, brand_id, brand_name, counts, log)
+
+        inserted, updated, errors = counts['inserted'], counts['updated'], counts['errors']
+
+        # Update brand stats
+        self.update_brand_stats(brand_id)
+
+        # Log scrape
+        self.log_scrape(brand_id, brand_name, total, inserted, updated, errors)
+
+        return inserted, updated, errors
 
-        for product in products_list:
+    def insert_products_batch(self, batch, brand_id, brand_name, counts, log=print):
+        """Upsert a batch of products in one bulk_write and log their prices, tallying into counts"""
+        ops = []
+        price_entries = []  # one per op (None if it has no price), so failed upserts can be skipped
+
+        for product in batch:
             try:
                 # Ensure product_id is set
                 if 'product_id' not in product:
                     if 'id' in product:
                         product['product_id'] = str(product['id'])
                     else:
-                        print(f"   ⚠️ Skipping product with missing ID: {product.get('title', 'Unknown')}")
-                        errors += 1
+                        log(f"   ⚠️ Skipping product with missing ID: {product.get('title', 'Unknown')}")
+                        counts['errors'] += 1
                         continue
 
                 product['brand_id'] = brand_id
@@ -69,41 +124,59 @@ class VastrDatabase:
                 product['scraped_at'] = datetime.now()
                 product['last_updated'] = datetime.now()
 
-                result = self.products.update_one(
-                    {
-                        'product_id': product['product_id'],
-                        'brand_id': brand_id
-                    },
-                    {'$set': product},
-                    upsert=True
-                )
-
-                if result.upserted_id:
-                    inserted += 1
-                else:
-                    updated += 1
-
                 # Log price
+                price_entry = None
                 if 'price_min' in product:
-                    self.log_price(
+                    price_entry = self._price_entry(
                         product['product_id'],
                         brand_id,
                         product['price_min'],
                         product.get('price_max')
                     )
 
+                ops.append(UpdateOne(
+                    {
+                        'product_id': product['product_id'],
+                        'brand_id': brand_id
+                    },
+                    {'$set': product},
+                    upsert=True
+                ))
+                price_entries.append(price_entry)
+
             except Exception as e:
-                errors += 1
-                if errors <= 3:
-                    print(f"   ❌ Error processing product {product.get('product_id', 'unknown')}: {e}")
+                counts['errors'] += 1
+                if counts['errors'] <= 3:
+                    log(f"   ❌ Error processing product {product.get('product_id', 'unknown')}: {e}")
 
-        # Update brand stats
-        self.update_brand_stats(brand_id)
+        # Only record prices for the products whose upsert went through
+        failed = self._flush_bulk(ops, counts)
+        price_entries = [entry for i, entry in enumerate(price_entries) if entry and i not in failed]
 
-        # Log scrape
-        self.log_scrape(brand_id, brand_name, len(products_list), inserted, updated, errors)
+        if price_entries:
+            try:
+                self.price_history.insert_many(price_entries, ordered=False)
+            except BulkWriteError as e:
+                log(f"   ❌ {len(e.details.get('writeErrors', []))} price records failed")
+
+    def _flush_bulk(self, ops, counts):
+        """
+        Send queued upserts in one unordered bulk_write, tally the results and clear the queue
+        Returns the indexes (into ops) of the upserts that failed
+        """
+        if not ops:
+            return set()
 
-        return inserted, updated, errors
+        try:
+            result = self.products.bulk_write(ops, ordered=False).bulk_api_result
+        except BulkWriteError as e:
+            result = e.details
+            counts['errors'] += len(result.get('writeErrors', []))
+
+        counts['inserted'] += result.get('nUpserted', 0)
+        counts['updated'] += result.get('nMatched', 0)
+        ops.clear()
+        return {err['index'] for err in result.get('writeErrors', [])}
 
     def update_brand_stats(self, brand_id):
         """Update brand document with latest stats"""
@@ -121,9 +194,9 @@ class VastrDatabase:
             upsert=True
         )
 
-    def log_price(self, product_id, brand_id, price, compare_price=None):
-        """Log price history"""
-        price_entry = {
+    def _price_entry(self, product_id, brand_id, price, compare_price=None):
+        """Build a price_history entry"""
+        return {
             'product_id': product_id,
             'brand_id': brand_id,
             'price': price,
@@ -131,7 +204,9 @@ class VastrDatabase:
             'date': datetime.now()
         }
 
-        self.price_history.insert_one(price_entry)
+    def log_price(self, product_id, brand_id, price, compare_price=None):
+        """Log price history"""
+        self.price_history.insert_one(self._price_entry(product_id, brand_id, price, compare_price))
 
     def log_scrape(self, brand_id, brand_name, total, inserted, updated, errors):
         """Log scraping activity"""
@@ -171,8 +246,8 @@ class VastrDatabase:
         return stats
 
     def close(self):
-        """Close database connection"""
-        self.client.close()
+        """The shared client is closed at exit"""
+        pass
 
 
 # ============================================
@@ -209,25 +284,39 @@ def import_brand_data(brand_id, json_file, db):
 
     brand_name = brand_names.get(brand_id, brand_id)
 
-    print(f"\n{'=' * 60}")
-    print(f"Importing: {brand_name}")
-    print(f"File: {json_file}")
-    print(f"{'=' * 60}")
-
+    # Brands are imported concurrently - buffer this brand's output and
+    # print it in one go so the blocks don't interleave
+    lines = []
     try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            products = json.load(f)
+        return _import_brand_data(brand_id, brand_name, json_file, db, lines.append)
+    finally:
+        print('\n'.join(lines))
 
-        print(f"📂 Loaded {len(products)} products")
 
-        inserted, updated, errors = db.insert_products_bulk(products, brand_id, brand_name)
+def _import_brand_data(brand_id, brand_name, json_file, db, log):
+    """Import one brand's file, reporting progress through log"""
+    log(f"\n{'=' * 60}")
+    log(f"Importing: {brand_name}")
+    log(f"File: {json_file}")
+    log(f"{'=' * 60}")
 
-        print(f"✅ Inserted: {inserted}, Updated: {updated}, Errors: {errors}")
+    try:
+        with open(json_file, 'rb') as f:
+            if ijson is not None:
+                # Parse products one at a time so batches are written while the file is still being read
+                products = ijson.items(f, 'item', use_float=True)
+            else:
+                products = orjson.loads(f.read())
+                log(f"📂 Loaded {len(products)} products")
+
+            inserted, updated, errors = db.insert_products_bulk(products, brand_id, brand_name, log)
+
+        log(f"✅ Inserted: {inserted}, Updated: {updated}, Errors: {errors}")
 
         return True
 
     except Exception as e:
-        print(f"❌ Error importing {brand_name}: {e}")
+        log(f"❌ Error importing {brand_name}: {e}")
         return False
 
 
@@ -247,19 +336,25 @@ if __name__ == "__main__":
     successful = 0
     failed = 0
 
-    for brand_id, file_pattern in BRAND_FILES.items():
-        json_file = find_latest_file(brand_id, file_pattern)
+    # Brands are imported concurrently - the shared client's pool is thread-safe
+    # and the threads spend most of their time waiting on file and socket I/O
+    with ThreadPoolExecutor(max_workers=IMPORT_WORKERS) as executor:
+        futures = {}
+        for brand_id, file_pattern in BRAND_FILES.items():
+            json_file = find_latest_file(brand_id, file_pattern)
+
+            if json_file:
+                futures[executor.submit(import_brand_data, brand_id, json_file, db)] = brand_id
+            else:
+                print(f"\n⚠️  No data file found for {brand_id}")
+                print(f"   Looking for: {file_pattern}")
+                failed += 1
 
-        if json_file:
-            success = import_brand_data(brand_id, json_file, db)
-            if success:
+        for future in as_completed(futures):
+            if future.result():
                 successful += 1
             else:
                 failed += 1
-        else:
-            print(f"\n⚠️  No data file found for {brand_id}")
-            print(f"   Looking for: {file_pattern}")
-            failed += 1
 
     print("\n" + "=" * 60)
     print("IMPORT COMPLETE - DATABASE STATISTICS")
@@ -0,0 +1,108 @@
+import contextlib
+import io
+import os
+import random
+import sys
+import unittest
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_cleaning_analysis import DataAnalyzer, _CATEGORY_MAPPING, join_tags, map_category, map_category_vec
+
+# Keywords, near-misses (substrings of other words) and case variants
+TITLE_WORDS = [
+    'Lawn', 'SUIT', 'Pret', 'stitched', 'Kurta', 'kurtas', 'Trouser', 'pants', 'Co-Ord',
+    'Top', 'topaz', 'Women', 'Menswear', 'ready to wear', 'Piece', 'Fabric', 'embroidered',
+    'blue', 'printed', 'shirt', 'Casual', 'western', 'bottom'
+]
+TAGS = [
+    'Lawn', 'unstitched', 'RTW', 'ready to wear', 'kurta', 'pant', 'tops', 'men',
+    'women', 'sale', 'new arrival', 'trouser set', 'co-ord', 'Summer'
+]
+PRODUCT_TYPES = list(_CATEGORY_MAPPING) + [
+    'Kurta', '  Pret ', 'SUIT', 'Accessories', 'Shoes', 'unknown', '', None
+]
+
+
+def make_products(n, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n):
+        title = ' '.join(rng.sample(TITLE_WORDS, rng.randint(0, 4)))
+        tags = rng.sample(TAGS, rng.randint(0, 3))
+        rows.append({
+            'product_type': rng.choice(PRODUCT_TYPES),
+            'title': rng.choice([title, title, None]),
+            'tags': rng.choice([tags, tags, [], None]),
+        })
+    return pd.DataFrame(rows)
+
+
+class MapCategoryVecTest(unittest.TestCase):
+
+    def assert_matches_map_category(self, df):
+        expected = [map_category(p, t, g) for p, t, g in zip(df['product_type'], df['title'], df['tags'])]
+        actual = map_category_vec(df['product_type'], df['title'], join_tags(df['tags']))
+        self.assertEqual(actual.tolist(), expected)
+        self.assertTrue(actual.index.equals(df.index))
+
+    def test_matches_map_category(self):
+        self.assert_matches_map_category(make_products(2000))
+
+    def test_keyword_priority(self):
+        df = pd.DataFrame({
+            'product_type': [None, None, None, None, None, 'Shoes'],
+            'title': ['Kurta with Trousers', 'Top and Pants', 'Women Kurta', 'topaz', None, 'Plain'],
+            'tags': [['rtw'], None, [], ['men'], ['Lawn'], ['summer']],
+        })
+        self.assert_matches_map_category(df)
+        actual = map_category_vec(df['product_type'], df['title'], join_tags(df['tags']))
+        self.assertEqual(actual.tolist(),
+                         ['Ready-to-Wear', 'Trousers', 'Kurta', 'Western', 'Unstitched', 'Others'])
+
+    def test_tags_match_whole_tags_only(self):
+        df = pd.DataFrame({
+            'product_type': [None, None, None],
+            'title': ['', '', ''],
+            'tags': [['trouser set'], ['menswear collection'], ['MEN']],
+        })
+        self.assert_matches_map_category(df)
+
+    def test_non_default_index(self):
+        df = make_products(50, seed=1)
+        df.index = range(100, 150)
+        self.assert_matches_map_category(df)
+
+
+class CategoryAnalysisTest(unittest.TestCase):
+
+    def test_matches_value_counts_per_brand(self):
+        rng = random.Random(2)
+        brands = ['Sapphire', 'Nishat Linen', 'Gul Ahmed', 'Alkaram']
+        types = ['Unstitched', 'Kurta', 'Trousers', 'Western', 'Others']
+        # Small counts so categories often tie
+        df = pd.DataFrame({
+            'brand_name': [rng.choice(brands) for _ in range(120)],
+            'product_type': [rng.choice(types) for _ in range(120)],
+        })
+
+        # What export_analysis used to build from the frame directly
+        expected = {
+            brand: dict(df[df['brand_name'] == brand]['product_type'].value_counts())
+            for brand in df['brand_name'].unique()
+        }
+
+        brand_counts = df.groupby('brand_name', sort=False, observed=True).size()
+        with contextlib.redirect_stdout(io.StringIO()):
+            brand_categories = DataAnalyzer.__new__(DataAnalyzer).category_analysis(df, brand_counts)
+
+        actual = {brand: dict(cats) for brand, cats in brand_categories.items()}
+        self.assertEqual(list(actual), list(expected))
+        for brand in expected:
+            self.assertEqual(list(actual[brand].items()), list(expected[brand].items()), brand)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,4 +1,6 @@
 import pandas as pd
+import csv
+import io
 import os
 import shutil
 
@@ -21,43 +23,58 @@ df = df.drop(columns=['brand_name'], errors='ignore')
 
 print(f"Total rows: {len(df):,}\nSplitting into plain CSV files (total < 400 KB)...\n")
 
+# Convert the frame to plain row tuples once (missing values as empty fields, like to_csv)
+records = list(df.astype(object).where(df.notna(), '').itertuples(index=False, name=None))
+
+
+def to_csv_text(rows):
+    """Header plus rows, formatted with the stdlib csv writer"""
+    buf = io.StringIO()
+    writer = csv.writer(buf, lineterminator='\n')
+    writer.writerow(df.columns)
+    writer.writerows(rows)
+    return buf.getvalue()
+
+
+# Estimate the CSV size of a row once from a sample instead of writing trial files
+SAMPLE_ROWS = 500
+header_bytes = len(to_csv_text([]).encode())
+sample_rows = min(len(records), SAMPLE_ROWS)
+sample_bytes = len(to_csv_text(records[:sample_rows]).encode()) - header_bytes
+bytes_per_row = max(sample_bytes / max(sample_rows, 1), 1)
+
 current_total_kb = 0
 part_num = 1
 start = 0
 
 while start < len(df) and current_total_kb < MAX_TOTAL_KB:
-    # Binary search for largest chunk that keeps total under limit
-    low, high = start, len(df)
-    best_end = start
-
-    while low <= high:
-        mid = (low + high) // 2
-        chunk = df.iloc[start:mid]
-
-        temp_file = os.path.join(OUTPUT_DIR, "temp.csv")
-        chunk.to_csv(temp_file, index=False)
-        size_kb = os.path.getsize(temp_file) / 1024
-        os.remove(temp_file)
-
-        if current_total_kb + size_kb <= MAX_TOTAL_KB:
-            best_end = mid
-            low = mid + 1
-        else:
-            high = mid - 1
+    # Largest chunk that keeps total under limit, sized from the per-row estimate
+    budget_bytes = (MAX_TOTAL_KB - current_total_kb) * 1024
+    rows = int((budget_bytes - header_bytes) / bytes_per_row)
+    best_end = min(start + max(rows, 0), len(df))
+    csv_text = to_csv_text(records[start:best_end])
+
+    # Rows past the sample can run longer than average - trim until the chunk fits
+    chunk_bytes = len(csv_text.encode())
+    while best_end > start and chunk_bytes > budget_bytes:
+        best_end = start + int((best_end - start) * budget_bytes / chunk_bytes)
+        csv_text = to_csv_text(records[start:best_end])
+        chunk_bytes = len(csv_text.encode())
 
     # If no progress, take at least 10 rows
     if best_end == start:
         best_end = min(start + 10, len(df))
+        csv_text = to_csv_text(records[start:best_end])
 
     # Save final chunk
-    final_chunk = df.iloc[start:best_end]
     output_file = os.path.join(OUTPUT_DIR, f"part_{part_num}.csv")
-    final_chunk.to_csv(output_file, index=False)
+    with open(output_file, 'w', encoding='utf-8', newline='') as f:
+        f.write(csv_text)
 
     file_size_kb = os.path.getsize(output_file) / 1024
     current_total_kb += file_size_kb
 
-    print(f"{os.path.basename(output_file)} → {len(final_chunk):,} rows → {file_size_kb:.1f} KB "
+    print(f"{os.path.basename(output_file)} → {best_end - start:,} rows → {file_size_kb:.1f} KB "
           f"(Total: {current_total_kb:.1f} KB)")
 
     start = best_end
@@ -1,13 +1,34 @@
-import requests
-import json
-import time
+import asyncio
+import httpx
+import orjson
+import os
+import re
+import numpy as np
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime
 
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional - fall back to one compiled regex
+    ahocorasick = None
+
 # Configuration
 HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
 }
 
+# Politeness limits: requests in flight to the site at once, and the pause
+# each request keeps its slot for before the next one can start
+MAX_CONCURRENT_REQUESTS = 4
+DELAY_BETWEEN_REQUESTS = 0.25
+MAX_RETRIES = 3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Products handed to each worker process - large enough to amortize pickling
+PROCESS_CHUNK_SIZE = 500
+
 
 # Multiple collections to get comprehensive clothing data
 CLOTHING_COLLECTIONS = [
@@ -22,172 +43,297 @@ CLOTHING_COLLECTIONS = [
 ]
 
 
-def scrape_collection(collection_handle, max_products=None):
-    """Scrape all products from a specific collection"""
+# Accessory keywords to filter out
+ACCESSORY_KEYWORDS = tuple(keyword.lower() for keyword in [
+    'shoe', 'shoes', 'heels', 'khussa', 'kolhapuri', 'sneaker', 'slipper', 'sandal',
+    'bag', 'clutch', 'handbag', 'wallet', 'purse',
+    'jewelry', 'jewellery', 'earring', 'necklace', 'bracelet', 'ring',
+    'perfume', 'fragrance', 'scent', 'candle',
+    'accessory', 'accessories'
+])
+
+
+def _build_accessory_automaton():
+    """Aho-Corasick automaton matching every accessory keyword in one pass"""
+    automaton = ahocorasick.Automaton()
+    for keyword in ACCESSORY_KEYWORDS:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+
+_ACCESSORY_AUTOMATON = _build_accessory_automaton() if ahocorasick else None
+_ACCESSORY_RE = re.compile('|'.join(re.escape(keyword) for keyword in ACCESSORY_KEYWORDS))
+
+
+def is_accessory(product):
+    """True if an accessory keyword appears in the product's type, title or tags"""
+    # NUL separators keep a keyword from matching across two fields or tags
+    haystack = '\x00'.join((
+        product.get('product_type', ''),
+        product.get('title', ''),
+        *product.get('tags', [])
+    )).lower()
+    if _ACCESSORY_AUTOMATON is not None:
+        return next(_ACCESSORY_AUTOMATON.iter(haystack), None) is not None
+    return _ACCESSORY_RE.search(haystack) is not None
+
+
+async def fetch_page(client, url, sem):
+    """GET a page, retrying 429/5xx responses with exponential backoff"""
+    for attempt in range(MAX_RETRIES + 1):
+        async with sem:
+            response = await client.get(url)
+            await asyncio.sleep(DELAY_BETWEEN_REQUESTS)  # Respectful delay
+
+        if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            return response
+
+        await asyncio.sleep(DELAY_BETWEEN_REQUESTS * 2 ** attempt)
+
+    return response
+
+
+async def scrape_collection(client, collection_handle, sem, max_products=None):
+    """Scrape all products from a specific collection, paging with a since_id cursor
+    and falling back to ?page= numbers if the store doesn't honour the cursor"""
     all_products = []
     page = 1
-
-    # Accessory keywords to filter out
-    ACCESSORY_KEYWORDS = [
-        'shoe', 'shoes', 'heels', 'khussa', 'kolhapuri', 'sneaker', 'slipper', 'sandal',
-        'bag', 'clutch', 'handbag', 'wallet', 'purse',
-        'jewelry', 'jewellery', 'earring', 'necklace', 'bracelet', 'ring',
-        'perfume', 'fragrance', 'scent', 'candle',
-        'accessory', 'accessories'
-    ]
+    since_id = 0
+    use_cursor = True
+    base_url = f"https://www.gulahmedshop.com/collections/{collection_handle}/products.json?limit=250"
 
     while True:
-        url = f"https://www.gulahmedshop.com/collections/{collection_handle}/products.json?page={page}&limit=250"
-        print(f"   Page {page}...", end=" ")
-
+        prefix = f"   {collection_handle} page {page}:"
         try:
-            response = requests.get(url, headers=HEADERS)
-
-            if response.status_code == 200:
-                data = response.json()
-                products = data.get('products', [])
-
-                if not products:
-                    print("Done!")
-                    break
-
-                # Filter out accessories
-                clothing_products = []
-                for product in products:
-                    product_type = product.get('product_type', '').lower()
-                    title = product.get('title', '').lower()
-                    tags = ' '.join(product.get('tags', [])).lower()
-
-                    # Check if it's an accessory
-                    is_accessory = any(keyword in product_type or keyword in title or keyword in tags
-                                       for keyword in ACCESSORY_KEYWORDS)
-
-                    if not is_accessory:
-                        clothing_products.append(product)
-
-                all_products.extend(clothing_products)
-                print(
-                    f"Got {len(clothing_products)} clothing items (filtered {len(products) - len(clothing_products)} accessories)")
-
-                if max_products and len(all_products) >= max_products:
-                    all_products = all_products[:max_products]
-                    break
-
-                page += 1
-                time.sleep(2)  # Respectful delay
-            else:
-                print(f"Error: Status {response.status_code}")
+            response = await fetch_page(
+                client,
+                f"{base_url}&since_id={since_id}" if use_cursor else f"{base_url}&page={page}",
+                sem
+            )
+
+            if response.status_code != 200:
+                print(f"{prefix} Error: Status {response.status_code}")
+                break
+
+            data = orjson.loads(response.content)
+            products = data.get('products', [])
+
+            if use_cursor and products:
+                # An honoured cursor returns strictly ascending ids above since_id. Anything
+                # else (ignored cursor, collection order) would skip products, so start over
+                ids = [p['id'] for p in products]
+                if ids[0] <= since_id or any(a >= b for a, b in zip(ids, ids[1:])):
+                    print(f"{prefix} Warning: since_id not honoured, discarding {len(all_products)} items "
+                          f"and re-scraping with page numbers")
+                    all_products = []
+                    page = 1
+                    use_cursor = False
+                    continue
+                since_id = ids[-1]
+
+            if not products:
+                print(f"{prefix} Done!")
+                break
+
+            # Filter out accessories
+            clothing_products = []
+            for product in products:
+                if not is_accessory(product):
+                    clothing_products.append(product)
+
+            all_products.extend(clothing_products)
+            print(
+                f"{prefix} Got {len(clothing_products)} clothing items (filtered {len(products) - len(clothing_products)} accessories)")
+
+            if max_products and len(all_products) >= max_products:
+                all_products = all_products[:max_products]
                 break
 
         except Exception as e:
-            print(f"Error: {e}")
+            print(f"{prefix} Error: {e}")
             break
 
+        page += 1
+
     return all_products
 
 
-def process_products(products):
+async def scrape_all_collections():
+    """Scrape every clothing collection concurrently over one connection pool and request limit"""
+    sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    limits = httpx.Limits(max_connections=16, max_keepalive_connections=16)
+    # httpx advertises br/zstd in Accept-Encoding once brotli/zstandard are installed,
+    # so JSON pages come back compressed and are decoded transparently
+    # transport retries cover connection failures, fetch_page covers 429/5xx
+    transport = httpx.AsyncHTTPTransport(http2=True, retries=MAX_RETRIES, limits=limits)
+
+    async with httpx.AsyncClient(transport=transport, headers=HEADERS, timeout=15) as client:
+        return await asyncio.gather(*[
+            scrape_collection(client, collection, sem) for collection in CLOTHING_COLLECTIONS
+        ])
+
+
+@dataclass(slots=True)
+class Variant:
+    """One size/colour option of a processed product"""
+    id: int
+    title: str
+    price: str
+    sku: str
+    available: bool
+    inventory_quantity: int | None
+
+
+@dataclass(slots=True)
+class Product:
+    """Processed product record - field order is the order written to JSON"""
+    id: int
+    title: str
+    handle: str
+    product_type: str
+    vendor: str
+    tags: list
+    published_at: str
+    created_at: str
+    url: str
+    price_min: float
+    price_max: float
+    available: bool
+    variant_count: int
+    image_count: int
+    images: list
+    description: str
+    variants: list
+
+
+def process_product(product):
     """Extract and structure key product information"""
-    processed = []
+    try:
+        # Get all variants
+        variants = product.get('variants', [])
+
+        # Get price range
+        prices = np.fromiter((float(v['price']) for v in variants if v.get('price')), dtype=np.float64)
+        min_price = float(prices.min()) if prices.size else 0
+        max_price = float(prices.max()) if prices.size else 0
+
+        # Get all images
+        images = product.get('images', [])
+        image_urls = [img.get('src') for img in images]
+
+        # Get availability
+        available = any(v.get('available', False) for v in variants)
+
+        processed_product = Product(
+            id=product.get('id'),
+            title=product.get('title'),
+            handle=product.get('handle'),
+            product_type=product.get('product_type'),
+            vendor=product.get('vendor'),
+            tags=product.get('tags', []),
+            published_at=product.get('published_at'),
+            created_at=product.get('created_at'),
+            url=f"https://www.gulahmedshop.com/products/{product.get('handle')}",
+            price_min=min_price,
+            price_max=max_price,
+            available=available,
+            variant_count=len(variants),
+            image_count=len(images),
+            images=image_urls,
+            description=(product.get('body_html') or '')[:500],  # First 500 chars
+            variants=[Variant(
+                id=v.get('id'),
+                title=v.get('title'),
+                price=v.get('price'),
+                sku=v.get('sku'),
+                available=v.get('available'),
+                inventory_quantity=v.get('inventory_quantity')
+            ) for v in variants]
+        )
+
+    except Exception as e:
+        print(f"Error processing product {product.get('id')}: {e}")
+        return None
+
+    return processed_product
+
+
+def process_chunk(chunk):
+    """Process a slice of products in a worker, dropping ones that fail"""
+    return [record for record in map(process_product, chunk) if record is not None]
+
+
+def iter_processed(products):
+    """Process products across worker processes, yielding records in their original order"""
+    chunks = [products[i:i + PROCESS_CHUNK_SIZE] for i in range(0, len(products), PROCESS_CHUNK_SIZE)]
+
+    # Not worth starting a pool for a single chunk
+    if len(chunks) <= 1:
+        for chunk in chunks:
+            yield from process_chunk(chunk)
+        return
 
-    for product in products:
-        try:
-            # Get all variants
-            variants = product.get('variants', [])
-
-            # Get price range
-            prices = [float(v.get('price', 0)) for v in variants if v.get('price')]
-            min_price = min(prices) if prices else 0
-            max_price = max(prices) if prices else 0
-
-            # Get all images
-            images = product.get('images', [])
-            image_urls = [img.get('src') for img in images]
-
-            # Get availability
-            available = any(v.get('available', False) for v in variants)
-
-            processed_product = {
-                'id': product.get('id'),
-                'title': product.get('title'),
-                'handle': product.get('handle'),
-                'product_type': product.get('product_type'),
-                'vendor': product.get('vendor'),
-                'tags': product.get('tags', []),
-                'published_at': product.get('published_at'),
-                'created_at': product.get('created_at'),
-                'url': f"https://www.gulahmedshop.com/products/{product.get('handle')}",
-                'price_min': min_price,
-                'price_max': max_price,
-                'available': available,
-                'variant_count': len(variants),
-                'image_count': len(images),
-                'images': image_urls,
-                'description': product.get('body_html', '')[:500],  # First 500 chars
-                'variants': [{
-                    'id': v.get('id'),
-                    'title': v.get('title'),
-                    'price': v.get('price'),
-                    'sku': v.get('sku'),
-                    'available': v.get('available'),
-                    'inventory_quantity': v.get('inventory_quantity')
-                } for v in variants]
-            }
-
-            processed.append(processed_product)
+    with ProcessPoolExecutor(max_workers=min(len(chunks), os.cpu_count() or 1)) as executor:
+        for records in executor.map(process_chunk, chunks):
+            yield from records
 
-        except Exception as e:
-            print(f"Error processing product {product.get('id')}: {e}")
-            continue
 
-    return processed
+# Product fields analyze_data reads, kept column-wise alongside the JSON dump
+STAT_COLUMNS = ('price_min', 'product_type', 'available', 'variant_count', 'image_count')
 
 
-def analyze_data(products):
-    """Analyze the scraped data"""
-    if not products:
-        return {}
+def analyze_data(cols):
+    """Analyze the scraped data from the STAT_COLUMNS columns (all zeros when empty)"""
+    total = len(cols['product_type'])
 
     # Price analysis
-    all_prices = [p['price_min'] for p in products if p['price_min'] > 0]
-
-    # Product type breakdown
-    product_types = {}
-    for p in products:
-        ptype = p.get('product_type', 'Unknown')
-        product_types[ptype] = product_types.get(ptype, 0) + 1
+    prices = np.asarray(cols['price_min'], dtype=np.float64)
+    prices = prices[prices > 0]
 
     # Availability
-    available_count = sum(1 for p in products if p['available'])
+    available_count = int(np.count_nonzero(cols['available']))
 
     analysis = {
-        'total_products': len(products),
+        'total_products': total,
         'available_products': available_count,
-        'unavailable_products': len(products) - available_count,
-        'price_min': min(all_prices) if all_prices else 0,
-        'price_max': max(all_prices) if all_prices else 0,
-        'price_avg': sum(all_prices) / len(all_prices) if all_prices else 0,
-        'product_types': product_types,
-        'total_variants': sum(p['variant_count'] for p in products),
-        'total_images': sum(p['image_count'] for p in products)
+        'unavailable_products': total - available_count,
+        'price_min': float(prices.min()) if prices.size else 0,
+        'price_max': float(prices.max()) if prices.size else 0,
+        'price_avg': float(prices.mean()) if prices.size else 0,
+        'product_types': Counter(cols['product_type']),
+        'total_variants': int(np.sum(cols['variant_count'], dtype=np.int64)),
+        'total_images': int(np.sum(cols['image_count'], dtype=np.int64))
     }
 
     return analysis
 
 
-def save_data(processed_data, raw_products):
+def save_data(processed_products):
     """Save data in multiple formats"""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
 
-    # Save processed JSON
+    # Stream processed JSON one product at a time, keeping only the stat
+    # columns the summary needs (same layout as an indent=2 dump of the list)
     json_file = f"data/gulahmed_clothing_{timestamp}.json"
-    with open(json_file, 'w', encoding='utf-8') as f:
-        json.dump(processed_data, f, indent=2, ensure_ascii=False)
+    cols = {name: [] for name in STAT_COLUMNS}
+    written = 0
+    with open(json_file, 'wb') as f:
+        f.write(b'[')
+        for product in processed_products:
+            item = orjson.dumps(product, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+            f.write(b',\n  ' if written else b'\n  ')
+            f.write(item.replace(b'\n', b'\n  '))
+            written += 1
+            for name in STAT_COLUMNS:
+                cols[name].append(getattr(product, name))
+        f.write(b'\n]' if written else b']')
     print(f"\nJSON saved: {json_file}")
 
 
     # Save analysis summary
-    analysis = analyze_data(processed_data)
+    analysis = analyze_data(cols)
+    ranked_types = analysis['product_types'].most_common()
     summary_file = f"data/gulahmed_clothing_{timestamp}_summary.txt"
     with open(summary_file, 'w', encoding='utf-8') as f:
         f.write("=" * 60 + "\n")
@@ -208,7 +354,7 @@ def save_data(processed_data, raw_products):
         f.write(f"Average: PKR {analysis['price_avg']:.2f}\n\n")
 
         f.write("PRODUCT TYPES:\n")
-        for ptype, count in sorted(analysis['product_types'].items(), key=lambda x: x[1], reverse=True):
+        for ptype, count in ranked_types:
             f.write(f"  {ptype}: {count}\n")
 
     print(f"Summary saved: {summary_file}")
@@ -221,7 +367,7 @@ def save_data(processed_data, raw_products):
     print(f"Available: {analysis['available_products']}")
     print(f"Price Range: PKR {analysis['price_min']:.0f} - PKR {analysis['price_max']:.0f}")
     print(f"\nTop Product Types:")
-    for ptype, count in list(sorted(analysis['product_types'].items(), key=lambda x: x[1], reverse=True))[:5]:
+    for ptype, count in ranked_types[:5]:
         print(f"  {ptype}: {count}")
 
 
@@ -232,18 +378,18 @@ def main():
     print("=" * 60)
 
     all_clothing = []
-
-    # Scrape from multiple clothing collections
-    for collection in CLOTHING_COLLECTIONS:
-        print(f"\nCollection: {collection}")
-        products = scrape_collection(collection)
-        all_clothing.extend(products)
-        print(f"   Collection total: {len(products)} items")
-
-    # Remove duplicates (same product might appear in multiple collections)
-    print("\nRemoving duplicates...")
-    unique_products = {p['id']: p for p in all_clothing}.values()
-    all_clothing = list(unique_products)
+    seen = set()
+
+    # Scrape from multiple clothing collections, skipping duplicates as we go
+    # (same product might appear in multiple collections)
+    results = asyncio.run(scrape_all_collections())
+    print()
+    for collection, products in zip(CLOTHING_COLLECTIONS, results):
+        for product in products:
+            if product['id'] not in seen:
+                seen.add(product['id'])
+                all_clothing.append(product)
+        print(f"Collection {collection} total: {len(products)} items")
 
     print(f"\nTotal unique clothing items: {len(all_clothing)}")
 
@@ -253,10 +399,10 @@ def main():
 
     # Process and save data
     print("\nProcessing product data...")
-    processed_data = process_products(all_clothing)
+    processed_data = iter_processed(all_clothing)
 
     print("Saving data...")
-    save_data(processed_data, all_clothing)
+    save_data(processed_data)
 
     print("\nDone!")
 
@@ -3,12 +3,20 @@ Re-scrape Nishat Linen products and update ONLY prices in database
 This preserves all your existing data (embeddings, etc.) and just fixes prices
 """
 
-import requests
-import time
-from pymongo import MongoClient
+import asyncio
+import httpx
+import orjson
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
 import os
+import re
 from dotenv import load_dotenv
 
+try:
+    import ahocorasick
+except ImportError:  # pyahocorasick is optional - fall back to one compiled regex
+    ahocorasick = None
+
 load_dotenv()
 
 # MongoDB connection
@@ -21,6 +29,16 @@ HEADERS = {
     'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
 }
 
+# Politeness limits: requests in flight to the site at once, and the pause
+# each request keeps its slot for before the next one can start
+MAX_CONCURRENT_REQUESTS = 4
+DELAY_BETWEEN_REQUESTS = 0.25
+MAX_RETRIES = 3
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Price updates sent per bulk_write
+BULK_BATCH_SIZE = 500
+
 CLOTHING_COLLECTIONS = [
     'new-in-unstitched',
     'unstitched',
@@ -34,63 +52,145 @@ CLOTHING_COLLECTIONS = [
 ]
 
 
-def scrape_collection(collection_handle):
-    """Scrape all products from a specific collection"""
-    all_products = []
-    page = 1
+# Accessory keywords to filter out
+ACCESSORY_KEYWORDS = tuple(keyword.lower() for keyword in [
+    'shoe', 'shoes', 'heels', 'khussa', 'kolhapuri', 'sneaker', 'slipper', 'sandal',
+    'bag', 'clutch', 'handbag', 'wallet', 'purse',
+    'jewelry', 'jewellery', 'earring', 'necklace', 'bracelet', 'ring',
+    'perfume', 'fragrance', 'scent', 'candle',
+    'accessory', 'accessories', 'dupatta-only', 'shawl-only'
+])
 
-    ACCESSORY_KEYWORDS = [
-        'shoe', 'shoes', 'heels', 'khussa', 'kolhapuri', 'sneaker', 'slipper', 'sandal',
-        'bag', 'clutch', 'handbag', 'wallet', 'purse',
-        'jewelry', 'jewellery', 'earring', 'necklace', 'bracelet', 'ring',
-        'perfume', 'fragrance', 'scent', 'candle',
-        'accessory', 'accessories', 'dupatta-only', 'shawl-only'
-    ]
 
-    while True:
-        url = f"https://nishatlinen.com/collections/{collection_handle}/products.json?page={page}&limit=250"
-        print(f"   Page {page}...", end=" ")
+def _build_accessory_automaton():
+    """Aho-Corasick automaton matching every accessory keyword in one pass"""
+    automaton = ahocorasick.Automaton()
+    for keyword in ACCESSORY_KEYWORDS:
+        automaton.add_word(keyword, keyword)
+    automaton.make_automaton()
+    return automaton
+
+
+_ACCESSORY_AUTOMATON = _build_accessory_automaton() if ahocorasick else None
+_ACCESSORY_RE = re.compile('|'.join(re.escape(keyword) for keyword in ACCESSORY_KEYWORDS))
 
-        try:
-            response = requests.get(url, headers=HEADERS)
 
-            if response.status_code == 200:
-                data = response.json()
-                products = data.get('products', [])
+def is_accessory(product):
+    """True if an accessory keyword appears in the product's type, title or tags"""
+    # NUL separators keep a keyword from matching across two fields or tags
+    haystack = '\x00'.join((
+        product.get('product_type', ''),
+        product.get('title', ''),
+        *product.get('tags', [])
+    )).lower()
+    if _ACCESSORY_AUTOMATON is not None:
+        return next(_ACCESSORY_AUTOMATON.iter(haystack), None) is not None
+    return _ACCESSORY_RE.search(haystack) is not None
 
-                if not products:
-                    print("Done!")
-                    break
 
-                # Filter out accessories
-                clothing_products = []
-                for product in products:
-                    product_type = product.get('product_type', '').lower()
-                    title = product.get('title', '').lower()
-                    tags = ' '.join(product.get('tags', [])).lower()
+async def fetch_page(client, url, sem):
+    """GET a page, retrying 429/5xx responses with exponential backoff"""
+    for attempt in range(MAX_RETRIES + 1):
+        async with sem:
+            response = await client.get(url)
+            await asyncio.sleep(DELAY_BETWEEN_REQUESTS)
 
-                    is_accessory = any(keyword in product_type or keyword in title or keyword in tags
-                                       for keyword in ACCESSORY_KEYWORDS)
+        if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            return response
 
-                    if not is_accessory:
-                        clothing_products.append(product)
+        await asyncio.sleep(DELAY_BETWEEN_REQUESTS * 2 ** attempt)
 
-                all_products.extend(clothing_products)
-                print(f"Got {len(clothing_products)} items")
+    return response
+
+
+async def scrape_collection(client, collection_handle, sem):
+    """Scrape all products from a specific collection, paging with a since_id cursor
+    and falling back to ?page= numbers if the store doesn't honour the cursor"""
+    all_products = []
+    page = 1
+    since_id = 0
+    use_cursor = True
+    base_url = f"https://nishatlinen.com/collections/{collection_handle}/products.json?limit=250"
+
+    while True:
+        prefix = f"   {collection_handle} page {page}:"
+        try:
+            response = await fetch_page(
+                client,
+                f"{base_url}&since_id={since_id}" if use_cursor else f"{base_url}&page={page}",
+                sem
+            )
+
+            if response.status_code != 200:
+                print(f"{prefix} Error: Status {response.status_code}")
+                break
 
-                page += 1
-                time.sleep(2)
-            else:
-                print(f"Error: Status {response.status_code}")
+            data = orjson.loads(response.content)
+            products = data.get('products', [])
+
+            if use_cursor and products:
+                # An honoured cursor returns strictly ascending ids above since_id. Anything
+                # else (ignored cursor, collection order) would skip products, so start over
+                ids = [p['id'] for p in products]
+                if ids[0] <= since_id or any(a >= b for a, b in zip(ids, ids[1:])):
+                    print(f"{prefix} Warning: since_id not honoured, discarding {len(all_products)} items "
+                          f"and re-scraping with page numbers")
+                    all_products = []
+                    page = 1
+                    use_cursor = False
+                    continue
+                since_id = ids[-1]
+
+            if not products:
+                print(f"{prefix} Done!")
                 break
 
+            # Filter out accessories
+            clothing_products = []
+            for product in products:
+                if not is_accessory(product):
+                    clothing_products.append(product)
+
+            all_products.extend(clothing_products)
+            print(f"{prefix} Got {len(clothing_products)} items")
+
         except Exception as e:
-            print(f"Error: {e}")
+            print(f"{prefix} Error: {e}")
             break
 
+        page += 1
+
     return all_products
 
 
+async def scrape_all_collections():
+    """Scrape every collection concurrently over one connection pool and request limit"""
+    sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+    limits = httpx.Limits(max_connections=16, max_keepalive_connections=16)
+    # httpx advertises br/zstd in Accept-Encoding once brotli/zstandard are installed,
+    # so JSON pages come back compressed and are decoded transparently
+    # transport retries cover connection failures, fetch_page covers 429/5xx
+    transport = httpx.AsyncHTTPTransport(http2=True, retries=MAX_RETRIES, limits=limits)
+
+    async with httpx.AsyncClient(transport=transport, headers=HEADERS, timeout=15) as http_client:
+        return await asyncio.gather(*[
+            scrape_collection(http_client, collection_handle, sem) for collection_handle in CLOTHING_COLLECTIONS
+        ])
+
+
+def flush_price_updates(ops):
+    """Send queued price updates in one round trip, returning (matched, not_found)"""
+    try:
+        result = collection.bulk_write(ops, ordered=False)
+        matched = result.matched_count
+    except BulkWriteError as e:
+        write_errors = e.details.get('writeErrors', [])
+        print(f"  {len(write_errors)} price updates failed")
+        matched = e.details.get('nMatched', 0)
+        return matched, len(ops) - matched - len(write_errors)
+    return matched, len(ops) - matched
+
+
 def update_product_prices():
     """Re-scrape products and update only prices in database"""
 
@@ -111,18 +211,17 @@ def update_product_prices():
     print("\nStarting scrape...\n")
 
     all_products = []
-
-    # Scrape from all collections
-    for collection_handle in CLOTHING_COLLECTIONS:
-        print(f"\nCollection: {collection_handle}")
-        products = scrape_collection(collection_handle)
-        all_products.extend(products)
-        print(f"   Collection total: {len(products)} items")
-
-    # Remove duplicates
-    print("\nRemoving duplicates...")
-    unique_products = {p['id']: p for p in all_products}.values()
-    all_products = list(unique_products)
+    seen = set()
+
+    # Scrape from all collections, skipping duplicates as we go
+    results = asyncio.run(scrape_all_collections())
+    print()
+    for collection_handle, products in zip(CLOTHING_COLLECTIONS, results):
+        for product in products:
+            if product['id'] not in seen:
+                seen.add(product['id'])
+                all_products.append(product)
+        print(f"Collection {collection_handle} total: {len(products)} items")
 
     print(f"Total unique products scraped: {len(all_products)}")
 
@@ -132,9 +231,15 @@ def update_product_prices():
 
     # Update prices in database
     print("\nUpdating prices in database...")
+    collection.create_index("product_id")
+
+    # Products already in the DB - anything else would just come back unmatched
+    existing_ids = set(collection.distinct("product_id", {"brand_name": "Nishat Linen"}))
+
     updated_count = 0
     not_found_count = 0
     skipped_count = 0
+    ops = []
 
     for product in all_products:
         try:
@@ -152,8 +257,11 @@ def update_product_prices():
             # Find product in database by Shopify product ID
             product_id = str(product.get('id'))
 
-            # Try to find by product_id field
-            result = collection.update_one(
+            if product_id not in existing_ids:
+                not_found_count += 1
+                continue
+
+            ops.append(UpdateOne(
                 {"product_id": product_id},
                 {
                     "$set": {
@@ -161,19 +269,24 @@ def update_product_prices():
                         "price_max": max_price
                     }
                 }
-            )
-
-            if result.matched_count > 0:
-                updated_count += 1
-                if updated_count % 50 == 0:
-                    print(f"  Updated {updated_count} products...")
-            else:
-                not_found_count += 1
+            ))
 
         except Exception as e:
             print(f"  Error updating {product.get('title', 'Unknown')}: {e}")
             continue
 
+        if len(ops) >= BULK_BATCH_SIZE:
+            matched, not_found = flush_price_updates(ops)
+            updated_count += matched
+            not_found_count += not_found
+            ops = []
+            print(f"  Updated {updated_count} products...")
+
+    if ops:
+        matched, not_found = flush_price_updates(ops)
+        updated_count += matched
+        not_found_count += not_found
+
     print("\n" + "=" * 70)
     print("PRICE UPDATE COMPLETE")
     print("=" * 70)
@@ -4,8 +4,35 @@ Identify which stores use Shopify (easy API access)
 """
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
-import time
+from datetime import datetime, timedelta
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+}
+
+# One pooled session shared by the platform checks and API probes
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+))
+
+# Stores checked at the same time (all different hosts)
+MAX_CONCURRENT_CHECKS = 8
+
+# Saved verdicts are reused until they are CACHE_TTL old - platforms change
+# on the order of months. Set VASTR_RECHECK=1 to check every store again.
+RESULTS_FILE = 'data/platform_check_results.json'
+CACHE_TTL = timedelta(days=1)
+RECHECK = os.getenv('VASTR_RECHECK') == '1'
 
 # ============================================
 # Pakistani Fashion Stores to Check
@@ -37,27 +64,61 @@ STORES_TO_CHECK = {
 }
 
 
+# ============================================
+# FUNCTION: Load Cached Results
+# ============================================
+def load_cached_results():
+    """
+    Saved results still inside CACHE_TTL, keyed by store URL
+    """
+    if RECHECK or not os.path.exists(RESULTS_FILE):
+        return {}
+
+    try:
+        with open(RESULTS_FILE) as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+    cutoff = datetime.now() - CACHE_TTL
+    return {
+        r['url']: r for r in saved
+        if r.get('checked_at') and datetime.fromisoformat(r['checked_at']) > cutoff
+    }
+
+
 # ============================================
 # FUNCTION: Check Platform
 # ============================================
-def check_platform(store_name, url):
+def check_platform(store_name, url, cache=None):
     """
     Check what e-commerce platform a store uses
     """
-    print(f"\n{'=' * 60}")
-    print(f"Checking: {store_name}")
-    print(f"URL: {url}")
-    print(f"{'=' * 60}")
-
+    # Stores are checked concurrently - buffer this store's report and
+    # print it in one go so the blocks don't interleave
+    lines = []
     try:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
+        return _check_platform(store_name, url, cache, lines.append)
+    finally:
+        print('\n'.join(lines))
+
 
-        response = requests.get(url, headers=headers, timeout=10)
+def _check_platform(store_name, url, cache, log):
+    log(f"\n{'=' * 60}")
+    log(f"Checking: {store_name}")
+    log(f"URL: {url}")
+    log(f"{'=' * 60}")
+
+    if cache and url in cache:
+        cached = cache[url]
+        log(f"♻️  Platform: {cached['platform']} (cached {cached['checked_at']})")
+        return cached
+
+    try:
+        response = SESSION.get(url, timeout=10)
 
         if response.status_code != 200:
-            print(f"❌ Failed to access (Status: {response.status_code})")
+            log(f"❌ Failed to access (Status: {response.status_code})")
             return None
 
         html = response.text.lower()
@@ -71,60 +132,61 @@ def check_platform(store_name, url):
         if 'shopify' in html or 'cdn.shopify.com' in html:
             platform = 'Shopify'
             api_available = True
-            print("✅ Platform: Shopify")
+            log("✅ Platform: Shopify")
 
             # Try Shopify API
             api_url = f"{url.rstrip('/')}/products.json?limit=1"
             try:
-                api_response = requests.get(api_url, timeout=5)
+                api_response = SESSION.get(api_url, timeout=5)
                 if api_response.status_code == 200:
                     data = api_response.json()
                     if data.get('products'):
-                        print(f"   ✅ Shopify API works! ({len(data['products'])} sample products)")
+                        log(f"   ✅ Shopify API works! ({len(data['products'])} sample products)")
                     else:
-                        print("   ⚠️  API accessible but no products")
+                        log("   ⚠️  API accessible but no products")
                 else:
-                    print(f"   ⚠️  API returned status {api_response.status_code}")
+                    log(f"   ⚠️  API returned status {api_response.status_code}")
             except:
-                print("   ⚠️  API test failed")
+                log("   ⚠️  API test failed")
 
         # Demandware/Salesforce Commerce Cloud
         elif 'demandware' in html or 'salesforce' in html:
             platform = 'Demandware/Salesforce'
             api_available = False
-            print("❌ Platform: Demandware (No easy API)")
+            log("❌ Platform: Demandware (No easy API)")
 
         # Magento
         elif 'magento' in html or 'mage' in html:
             platform = 'Magento'
             api_available = False
-            print("⚠️  Platform: Magento (Complex API)")
+            log("⚠️  Platform: Magento (Complex API)")
 
         # WooCommerce
         elif 'woocommerce' in html or 'wp-content' in html:
             platform = 'WooCommerce'
             api_available = True
-            print("⚠️  Platform: WooCommerce (API available with auth)")
+            log("⚠️  Platform: WooCommerce (API available with auth)")
 
         # Custom
         else:
             platform = 'Custom/Unknown'
             api_available = False
-            print("⚠️  Platform: Custom or Unknown")
+            log("⚠️  Platform: Custom or Unknown")
 
         return {
             'store': store_name,
             'url': url,
             'platform': platform,
             'api_available': api_available,
-            'status': response.status_code
+            'status': response.status_code,
+            'checked_at': datetime.now().isoformat(timespec='seconds')
         }
 
     except requests.exceptions.Timeout:
-        print(f"⏱️  Timeout - site too slow")
+        log(f"⏱️  Timeout - site too slow")
         return None
     except Exception as e:
-        print(f"❌ Error: {e}")
+        log(f"❌ Error: {e}")
         return None
 
 
@@ -143,7 +205,7 @@ def test_shopify_api(url):
     for endpoint in endpoints:
         test_url = f"{url.rstrip('/')}{endpoint}"
         try:
-            response = requests.get(test_url, timeout=5)
+            response = SESSION.get(test_url, timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 print(f"   ✅ {endpoint}: Works!")
@@ -167,14 +229,15 @@ if __name__ == "__main__":
     ╚═══════════════════════════════════════════════════════╝
     """)
 
-    results = []
+    cache = load_cached_results()
 
-    # Check all stores
-    for store_name, url in STORES_TO_CHECK.items():
-        result = check_platform(store_name, url)
-        if result:
-            results.append(result)
-        time.sleep(2)  # Be respectful, wait between requests
+    # Check all stores - each is a different host, so they can run side by side
+    try:
+        with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_CHECKS) as executor:
+            checked = executor.map(lambda store: check_platform(*store, cache), STORES_TO_CHECK.items())
+            results = [result for result in checked if result]
+    finally:
+        SESSION.close()
 
     # Summary
     print("\n" + "=" * 60)
@@ -220,9 +283,7 @@ if __name__ == "__main__":
         print("You'll need to use Apify for non-Shopify stores.")
 
     # Save results
-    import json
-
-    with open('data/platform_check_results.json', 'w') as f:
+    with open(RESULTS_FILE, 'w') as f:
         json.dump(results, f, indent=2)
 
-    print(f"\n💾 Full results saved to: data/platform_check_results.json")
\ No newline at end of file
+    print(f"\n💾 Full results saved to: {RESULTS_FILE}")
\ No newline at end of file